@@ -0,0 +1,70 @@
+# encoding: utf-8
+"""
+比较各返回格式的数据大小与序列化耗时
+
+    python benchmarks/formats.py [rows]
+"""
+from __future__ import absolute_import, unicode_literals, print_function
+
+import datetime
+import decimal
+import sys
+import timeit
+import uuid
+
+from tornadoapi.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from tornadoapi.core.encoder import get_json_encoder  # noqa: E402
+from tornadoapi.handler import ApiHandler  # noqa: E402
+from tornadoapi.renderers import JSONRenderer, MsgpackRenderer, CBORRenderer  # noqa: E402
+
+
+class BenchHandler(object):
+    tonadoapi_get_res_dict = staticmethod(ApiHandler.tonadoapi_get_res_dict)
+    tonadoapi_get_res_json = staticmethod(ApiHandler.tonadoapi_get_res_json)
+
+
+def get_rows(count):
+    now = datetime.datetime.now()
+    return [
+        {
+            'id': i,
+            'uuid': uuid.UUID(int=i),
+            'name': 'name%d' % i,
+            'price': decimal.Decimal('%d.25' % i),
+            'score': i * 0.5,
+            'values': [i, i * 2, i * 3, i * 4],
+            'created': now,
+            'day': now.date(),
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    rows = get_rows(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    renderers = [('json', JSONRenderer())]
+    try:
+        import orjson  # noqa: F401
+        renderers.append(('json (orjson)', JSONRenderer()))
+    except ImportError:
+        pass
+    renderers += [('msgpack', MsgpackRenderer()), ('cbor', CBORRenderer())]
+    print('%-16s %12s %12s' % ('format', 'bytes', 'ms/encode'))
+    for name, renderer in renderers:
+        if not renderer.is_available():
+            print('%-16s %25s' % (name, 'not installed'))
+            continue
+        settings.JSON_ENCODER_BACKEND = 'orjson' if 'orjson' in name else 'json'
+        get_json_encoder()
+        size = len(renderer.render(BenchHandler, rows))
+        number = 20
+        seconds = min(timeit.repeat(lambda: renderer.render(BenchHandler, rows), number=number, repeat=3))
+        print('%-16s %12d %12.3f' % (name, size, seconds * 1000 / number))
+
+
+if __name__ == '__main__':
+    main()
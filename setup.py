@@ -102,6 +102,11 @@ setup(
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
+        'orjson': ['orjson'],
+        'msgpack': ['msgpack'],
+        'cbor': ['cbor2'],
+        'brotli': ['brotli'],
+        'yaml': ['PyYAML'],
     },
 
     # If there are data files included in your packages that need to be
@@ -122,9 +127,9 @@ setup(
     # To provide executable scripts, use entry points in preference to the
     # "scripts" keyword. Entry points provide cross-platform support and allow
     # pip to create the appropriate form of executable for the target platform.
-    # entry_points={
-    #     #'console_scripts': [
-    #     #    'sample=sample:main',
-    #     #],
-    # },
+    entry_points={
+        'console_scripts': [
+            'tornadoapi-openapi=tornadoapi.openapi_cli:main',
+        ],
+    },
 )
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+import pickle
+import unittest
+
+from tornadoapi.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from tornadoapi import fields  # noqa: E402
+from tornadoapi.core.exceptions import ValidationError  # noqa: E402
+from tornadoapi.schema import Schema  # noqa: E402
+from tornadoapi.validators import MaxLengthValidator  # noqa: E402
+
+
+class ContextValidator(object):
+
+    def __init__(self):
+        self.field = None
+
+    def set_context(self, field):
+        self.field = field
+
+    def __call__(self, value):
+        if value == 'bad':
+            raise ValidationError('context', code='context')
+
+
+class FieldTestCase(unittest.TestCase):
+
+    def test_run_validation(self):
+        field = fields.IntegerField(min_value=1, max_value=10)
+        self.assertEqual(5, field.run_validation('5'))
+        with self.assertRaises(ValidationError) as cm:
+            field.run_validation('11')
+        self.assertEqual(['max_value'], [detail.code for detail in cm.exception.detail])
+        with self.assertRaises(ValidationError) as cm:
+            field.run_validation(fields.empty)
+        self.assertEqual(['required'], [detail.code for detail in cm.exception.detail])
+        self.assertEqual(3, fields.IntegerField(default=3).run_validation())
+
+    def test_char_field(self):
+        field = fields.CharField(max_length=3, allow_null=True)
+        self.assertEqual('abc', field.run_validation(' abc '))
+        self.assertIsNone(field.run_validation(None))
+        with self.assertRaises(ValidationError) as cm:
+            field.run_validation('  ')
+        self.assertEqual(['blank'], [detail.code for detail in cm.exception.detail])
+        self.assertEqual('', fields.CharField(allow_blank=True).run_validation(''))
+
+    def test_collect_errors(self):
+        validator = ContextValidator()
+        field = fields.CharField(validators=[validator, MaxLengthValidator(2)])
+        self.assertEqual('ok', field.run_validation('ok'))
+        self.assertIs(field, validator.field)
+        with self.assertRaises(ValidationError) as cm:
+            field.run_validation('bad')
+        self.assertEqual(['context', 'max_length'], [detail.code for detail in cm.exception.detail])
+
+        field.validators = []
+        self.assertEqual('bad', field.run_validation('bad'))
+
+
+class SchemaTestCase(unittest.TestCase):
+
+    def get_schema(self):
+        return Schema([
+            ('name', fields.CharField(max_length=5)),
+            ('count', fields.IntegerField(default=1, min_value=0)),
+        ])
+
+    def test_validate(self):
+        schema = self.get_schema()
+        values, errors = schema.validate({'name': 'abc'})
+        self.assertEqual({'name': 'abc', 'count': 1}, dict(values))
+        self.assertEqual({}, errors)
+
+        values, errors = schema.validate({'count': '-1'})
+        self.assertEqual({}, dict(values))
+        self.assertEqual(['name', 'count'], list(errors.keys()))
+
+    def test_validate_many(self):
+        schema = pickle.loads(pickle.dumps(self.get_schema()))
+        values_list, errors = schema.validate_many([{'name': 'a'}, {'name': 'abcdef'}, {'name': 'b', 'count': 3}])
+        self.assertEqual([('a', 1), ('b', 3)], [(values['name'], values['count']) for values in values_list[::2]])
+        self.assertEqual([1], list(errors.keys()))
+        self.assertEqual(['max_length'], [detail.code for detail in errors[1]['name']])
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+from six.moves import builtins
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application
+
+from tornadoapi.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from tornadoapi import fields  # noqa: E402
+from tornadoapi.core import json_loads  # noqa: E402
+from tornadoapi.core.err_code import ErrCode  # noqa: E402
+from tornadoapi.core.multipart import MultipartParser, StreamedFile  # noqa: E402
+from tornadoapi.handler import ApiHandler, ApiDocHandler, StreamingApiHandler, \
+    FIELD_SOURCE_ARGUMENT, FIELD_SOURCE_FILE, FIELD_SOURCE_RAW_BODY  # noqa: E402
+from tornadoapi.metrics import CacheMetricsHandler  # noqa: E402
+
+StopAsyncIteration = getattr(builtins, 'StopAsyncIteration', StopIteration)
+
+
+def multipart_body(boundary, name, value, file_name, filename, content):
+    return (
+        '--{b}\r\nContent-Disposition: form-data; name="{n}"\r\n\r\n{v}\r\n'
+        '--{b}\r\nContent-Disposition: form-data; name="{fn}"; filename="{f}"\r\n'
+        'Content-Type: text/plain\r\n\r\n'.format(b=boundary, n=name, v=value, fn=file_name, f=filename)
+    ).encode('utf-8') + content + '\r\n--{b}--\r\n'.format(b=boundary).encode('utf-8')
+
+
+class SampleHandler(ApiHandler):
+    name = fields.CharField(description='名称')
+    count = fields.IntegerField(description='数量', default=1, max_value=10)
+
+    def get(self, *args, **kwargs):
+        self.write_api({'name': self.name, 'count': self.count})
+
+    post = get
+
+
+class SubSampleHandler(SampleHandler):
+    count = None
+    body = fields.JSONField(description='内容', raw_body=True, default=None)
+    upload = fields.FileField(description='文件', default=None)
+
+
+class JsonBodyHandler(ApiHandler):
+    JSON_BODY = True
+    name = fields.CharField(description='名称')
+    tags = fields.JSONField(description='标签', default=None)
+    owner = fields.SchemaField({
+        'id': fields.IntegerField(min_value=1),
+        'nick': fields.CharField(default=''),
+    }, description='所有者', default=None)
+
+    def post(self, *args, **kwargs):
+        self.write_api({'name': self.name, 'tags': self.tags, 'owner': self.owner})
+
+
+class UploadHandler(StreamingApiHandler):
+    STREAM_MAX_FILE_SIZE = 200 * 1024
+    STREAM_FILE_MEMORY_SIZE = 1024
+    name = fields.CharField(description='名称')
+    upload = fields.FileField(description='文件')
+
+    def post(self, *args, **kwargs):
+        self.write_api({
+            'name': self.name,
+            'streamed': isinstance(self.upload, StreamedFile),
+            'filename': self.upload.filename,
+            'size': self.upload.size,
+            'head': self.upload.read(3).decode('utf-8'),
+        })
+
+
+class AsyncRange(object):
+
+    def __init__(self, count):
+        self.index = 0
+        self.count = count
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = Future()
+        if self.index >= self.count:
+            future.set_exception(StopAsyncIteration())
+        else:
+            future.set_result({'id': self.index})
+            self.index += 1
+        return future
+
+
+class StreamHandler(ApiHandler):
+    count = fields.IntegerField(description='数量')
+    ndjson = fields.BooleanField(description='NDJSON', default=False)
+    is_async = fields.BooleanField(description='异步', default=False)
+
+    @gen.coroutine
+    def get(self, *args, **kwargs):
+        rows = AsyncRange(self.count) if self.is_async else ({'id': i} for i in range(self.count))
+        yield self.write_api_stream(rows, batch_size=3, ndjson=self.ndjson)
+
+
+class HandlerTestCase(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return Application([
+            (r'/sample', SampleHandler),
+            (r'/sub', SubSampleHandler),
+            (r'/json', JsonBodyHandler),
+            (r'/upload', UploadHandler),
+            (r'/stream', StreamHandler),
+            (r'/doc', ApiDocHandler),
+            (r'/metrics', CacheMetricsHandler),
+        ])
+
+    def test_compiled_fields(self):
+        self.assertEqual(
+            [(name, source) for name, field, source in SampleHandler.tonadoapi_get_fields()],
+            [('count', FIELD_SOURCE_ARGUMENT), ('name', FIELD_SOURCE_ARGUMENT)]
+        )
+        self.assertEqual(
+            [(name, source) for name, field, source in SubSampleHandler.tonadoapi_get_fields()],
+            [('body', FIELD_SOURCE_RAW_BODY), ('name', FIELD_SOURCE_ARGUMENT), ('upload', FIELD_SOURCE_FILE)]
+        )
+
+    def test_compiled_fields_setattr(self):
+        class DynamicHandler(SampleHandler):
+            pass
+        DynamicHandler.extra = fields.CharField(default=None)
+        self.assertIn('extra', [name for name, field, source in DynamicHandler.tonadoapi_get_fields()])
+        del DynamicHandler.extra
+        self.assertNotIn('extra', [name for name, field, source in DynamicHandler.tonadoapi_get_fields()])
+
+        class SubDynamicHandler(DynamicHandler):
+            pass
+        DynamicHandler.extra = fields.CharField(default=None)
+        self.assertIn('extra', [name for name, field, source in SubDynamicHandler.tonadoapi_get_fields()])
+        self.assertIn('extra', dict(SubDynamicHandler.tonadoapi_schema().fields))
+        SubDynamicHandler.extra = None
+        self.assertNotIn('extra', [name for name, field, source in SubDynamicHandler.tonadoapi_get_fields()])
+        self.assertIn('extra', [name for name, field, source in DynamicHandler.tonadoapi_get_fields()])
+        del SubDynamicHandler.extra
+        DynamicHandler.extra = None
+        self.assertNotIn('extra', [name for name, field, source in DynamicHandler.tonadoapi_get_fields()])
+        self.assertNotIn('extra', [name for name, field, source in SubDynamicHandler.tonadoapi_get_fields()])
+        self.assertNotIn('extra', dict(SubDynamicHandler.tonadoapi_schema().fields))
+
+    def test_schema(self):
+        schema = SubSampleHandler.tonadoapi_schema()
+        self.assertIs(schema, SubSampleHandler.tonadoapi_schema())
+        self.assertEqual(['body', 'name', 'upload'], schema.get_field_names())
+        values, errors = SampleHandler.tonadoapi_schema().validate({'name': 'abc'})
+        self.assertEqual({'name': 'abc', 'count': 1}, dict(values))
+
+    def test_prepare(self):
+        res = json_loads(self.fetch('/sample?name=abc&count=3').body)
+        self.assertEqual(0, res.code)
+        self.assertEqual({'name': 'abc', 'count': 3}, res.data)
+
+        res = json_loads(self.fetch('/sample?name=a&count=2', method='POST', body='name=%20b\x01c%20').body)
+        self.assertEqual({'name': 'b c', 'count': 2}, res.data)
+
+        body = self.fetch('/sample?name=abc&format=jsonp&callback=cb').body
+        self.assertEqual(b'cb(', body[:3])
+        self.assertEqual({'name': 'abc', 'count': 1}, json_loads(body[3:-2]).data)
+
+        response = self.fetch('/sample?name=abc', headers={'Accept': 'text/javascript, application/json;q=0.5'})
+        self.assertEqual('application/javascript', response.headers['Content-Type'])
+        response = self.fetch('/sample?name=abc', headers={'Accept': 'text/html,*/*;q=0.8'})
+        self.assertEqual('application/json; charset=UTF-8', response.headers['Content-Type'])
+        self.assertEqual(400, self.fetch('/sample?name=abc&format=preview').code)
+
+        res = json_loads(self.fetch('/sample?count=30').body)
+        self.assertEqual(-11, res.code)
+        self.assertEqual({'name', 'count'}, set(res.data.keys()))
+
+        res = json_loads(self.fetch('/sub', method='POST', body='{"a": 1}').body)
+        self.assertEqual(-11, res.code)
+        self.assertEqual(['name'], list(res.data.keys()))
+
+    def test_field_info_cache(self):
+        field_info = SampleHandler.tonadoapi_field_info()
+        self.assertIs(field_info, SampleHandler.tonadoapi_field_info())
+        self.assertEqual(['count', 'name'], list(field_info.keys()))
+        self.assertEqual('IntegerField', field_info['count']['type'])
+        self.assertEqual(['body', 'name', 'upload'], list(SubSampleHandler.tonadoapi_field_info().keys()))
+        with self.assertRaises(AttributeError):
+            field_info['count'] = None
+        with self.assertRaises(AttributeError):
+            field_info['count']['type'] = None
+
+    def test_json_body(self):
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        body = '{"name": "abc", "tags": ["a", "b"], "owner": {"id": "3"}}'
+        res = json_loads(self.fetch('/json', method='POST', body=body, headers=headers).body)
+        self.assertEqual(0, res.code)
+        self.assertEqual({'name': 'abc', 'tags': ['a', 'b'], 'owner': {'id': 3, 'nick': ''}}, res.data)
+
+        res = json_loads(self.fetch('/json?name=q', method='POST', body='{"owner": {"id": 0}}', headers=headers).body)
+        self.assertEqual(-11, res.code)
+        self.assertEqual(['id'], list(res.data.owner.keys()))
+
+        res = json_loads(self.fetch('/json', method='POST', body='[1', headers=headers).body)
+        self.assertEqual(-12, res.code)
+
+        res = json_loads(self.fetch(
+            '/json', method='POST', body='{"name": "abc"}', headers={'Content-Type': 'application/vnd.api+json'}
+        ).body)
+        self.assertEqual('abc', res.data.name)
+
+        # 非 JSON 请求体按表单参数获取
+        res = json_loads(self.fetch('/json', method='POST', body='name=form&tags=%5B1%5D').body)
+        self.assertEqual(0, res.code)
+        self.assertEqual({'name': 'form', 'tags': [1], 'owner': None}, res.data)
+        body = multipart_body('xyz', 'name', 'multi', 'upload', 'a.txt', b'hello')
+        res = json_loads(self.fetch(
+            '/json', method='POST', body=body, headers={'Content-Type': 'multipart/form-data; boundary=xyz'}
+        ).body)
+        self.assertEqual('multi', res.data.name)
+
+    def test_multipart_parser(self):
+        body = multipart_body('xyz', 'name', 'abc', 'upload', 'a.txt', b'hello\r\n--xy world')
+        parser = MultipartParser('xyz')
+        for i in range(len(body)):
+            parser.feed(body[i:i + 1])
+        parser.finish()
+        self.assertEqual({'name': [b'abc']}, parser.arguments)
+        self.assertEqual(b'hello\r\n--xy world', parser.files['upload'][0].read())
+        parser.feed(b'epilogue' * 1000)
+        self.assertEqual(0, len(parser._buffer))
+        parser.close()
+
+        # 非 UTF-8 的文件名按 latin-1 解码
+        body = multipart_body('xyz', 'name', 'abc', 'upload', '\xe9.txt', b'hello')
+        body = body.replace('\xe9.txt'.encode('utf-8'), b'\xe9.txt')
+        parser = MultipartParser('xyz')
+        parser.feed(body)
+        parser.finish()
+        self.assertEqual('\xe9.txt', parser.files['upload'][0].filename)
+        parser.close()
+
+    def test_streaming_upload(self):
+        headers = {'Content-Type': 'multipart/form-data; boundary=xyz'}
+        content = b'abc' * 50000
+        body = multipart_body('xyz', 'name', 'test', 'upload', 'a.txt', content)
+        res = json_loads(self.fetch('/upload', method='POST', headers=headers, body=body).body)
+        self.assertEqual(0, res.code)
+        self.assertEqual(
+            {'name': 'test', 'streamed': True, 'filename': 'a.txt', 'size': len(content), 'head': 'abc'}, res.data
+        )
+
+        body = multipart_body('xyz', 'name', 'test', 'upload', 'a.txt', content * 2)
+        response = self.fetch('/upload', method='POST', headers=headers, body=body)
+        self.assertEqual(413, response.code)
+
+        res = json_loads(self.fetch('/upload', method='POST', body='name=test').body)
+        self.assertEqual(['upload'], list(res.data.keys()))
+
+    def test_binary_formats(self):
+        try:
+            import msgpack
+        except ImportError:
+            return
+        response = self.fetch('/sample?name=abc', headers={'Accept': 'application/x-msgpack'})
+        self.assertEqual('application/msgpack', response.headers['Content-Type'])
+        self.assertEqual({'name': 'abc', 'count': 1}, msgpack.unpackb(response.body, raw=False)['data'])
+
+    def test_write_api_stream(self):
+        for query in ('count=7', 'count=7&is_async=1'):
+            res = json_loads(self.fetch('/stream?' + query).body)
+            self.assertEqual(0, res.code)
+            self.assertEqual([{'id': i} for i in range(7)], res.data)
+
+        # 与 write_api 的结果逐字节相同
+        backends = ['json']
+        try:
+            import orjson  # noqa: F401
+            backends.append('orjson')
+        except ImportError:
+            pass
+        for backend in backends:
+            settings.JSON_ENCODER_BACKEND = backend
+            try:
+                body = self.fetch('/stream?count=7').body
+                self.assertEqual(ErrCode.SUCCESS.get_res_json(data=[{'id': i} for i in range(7)]), body)
+            finally:
+                settings.JSON_ENCODER_BACKEND = 'json'
+        self.assertEqual([], json_loads(self.fetch('/stream?count=0').body).data)
+        body = self.fetch('/stream?count=4&ndjson=1').body
+        self.assertEqual(b'{"id": 0}\n{"id": 1}\n{"id": 2}\n{"id": 3}\n', body)
+
+    def test_compression(self):
+        import gzip
+        settings.RESPONSE_COMPRESSION = {'encodings': ('gzip', ), 'min_length': 100}
+        try:
+            headers = {'Accept-Encoding': 'br, gzip;q=0.5'}
+            response = self.fetch('/sample?name=abc', headers=headers, decompress_response=False)
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertEqual('Accept-Encoding', response.headers['Vary'])
+
+            name = 'abc' * 100
+            response = self.fetch('/sample?name=' + name, headers=headers, decompress_response=False)
+            self.assertEqual('gzip', response.headers['Content-Encoding'])
+            self.assertEqual(name, json_loads(gzip.decompress(response.body)).data['name'])
+
+            headers = {'Accept-Encoding': 'gzip'}
+            response = self.fetch('/doc', headers=headers, decompress_response=False)
+            self.assertEqual('gzip', response.headers['Content-Encoding'])
+            self.assertEqual(response.body, self.fetch('/doc', headers=headers, decompress_response=False).body)
+        finally:
+            settings.RESPONSE_COMPRESSION = None
+        self.assertNotIn('Content-Encoding', self.fetch('/sample?name=' + name, headers=headers).headers)
+
+    def test_doc_cache(self):
+        response = self.fetch('/doc')
+        self.assertEqual(200, response.code)
+        self.assertIn(b'SubSampleHandler', response.body)
+        etag = response.headers['Etag']
+        self.assertEqual(304, self.fetch('/doc', headers={'If-None-Match': etag}).code)
+
+        self._app.wildcard_router.add_rules([(r'/other', SampleHandler, None, 'other_sample')])
+        response = self.fetch('/doc', headers={'If-None-Match': etag})
+        self.assertEqual(200, response.code)
+        self.assertIn(b'other_sample', response.body)
+        self.assertNotEqual(etag, response.headers['Etag'])
+
+    def test_cache_metrics(self):
+        from tornadoapi.storage import stats
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        cache = SampleCache(MemoryStorage(), prefix='metrics')
+        stats.reset_cache_stats()
+        settings.CACHE_STATS = True
+        try:
+            cache.test_item1.get('a')
+        finally:
+            settings.CACHE_STATS = False
+        response = self.fetch('/metrics')
+        self.assertEqual(200, response.code)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'tornadoapi_cache_misses_total{prefix="metrics",item="test_item1"} 1\n', response.body)
+        self.assertIn(
+            b'tornadoapi_cache_latency_seconds_count{prefix="metrics",item="test_item1",op="get"} 1\n', response.body
+        )
+        response = self.fetch('/metrics?format=json')
+        self.assertEqual(1, json_loads(response.body)['metrics']['items']['test_item1']['misses'])
+        stats.reset_cache_stats()
@@ -0,0 +1,111 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+import os
+import tempfile
+
+from tornado.testing import AsyncHTTPTestCase
+from tornado.web import Application
+
+from tornadoapi.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from tornadoapi import fields  # noqa: E402
+from tornadoapi.core import json_loads  # noqa: E402
+from tornadoapi.handler import ApiHandler  # noqa: E402
+from tornadoapi.openapi import OpenApiGenerator, OpenApiHandler  # noqa: E402
+from tornadoapi.openapi_cli import main  # noqa: E402
+
+
+class UserHandler(ApiHandler):
+    user_id = fields.IntegerField(description='用户ID', min_value=1)
+    name = fields.CharField(description='名称', max_length=20, default='')
+    gender = fields.ChoiceField(choices=((1, '男'), (2, '女')), description='性别', default=1)
+    avatar = fields.FileField(description='头像', default=None)
+
+    def get(self, *args, **kwargs):
+        self.write_api(None)
+
+    def post(self, *args, **kwargs):
+        self.write_api(None)
+
+
+class RawBodyHandler(ApiHandler):
+    body = fields.JSONField(description='内容', raw_body=True)
+
+    def put(self, *args, **kwargs):
+        self.write_api(None)
+
+
+class JsonBodyHandler(ApiHandler):
+    JSON_BODY = True
+    owner = fields.SchemaField({'id': fields.IntegerField()}, description='所有者')
+
+    def post(self, *args, **kwargs):
+        self.write_api(self.owner)
+
+
+def make_app():
+    return Application([
+        (r'/user/(?P<user_id>\d+)', UserHandler),
+        (r'/raw', RawBodyHandler),
+        (r'/json', JsonBodyHandler),
+        (r'/openapi', OpenApiHandler, {'title': 'Test'}),
+    ])
+
+
+class OpenApiTestCase(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return make_app()
+
+    def test_spec(self):
+        spec = OpenApiGenerator('Test').get_spec(self._app.wildcard_router.rules)
+        self.assertEqual(['/json', '/raw', '/user/{user_id}'], sorted(spec['paths'].keys()))
+
+        get = spec['paths']['/user/{user_id}']['get']
+        params = dict((p['name'], p) for p in get['parameters'])
+        self.assertEqual('path', params['user_id']['in'])
+        self.assertEqual({'type': 'integer', 'minimum': 1, 'title': '用户ID'}, params['user_id']['schema'])
+        self.assertEqual({'type': 'string', 'maxLength': 20, 'title': '名称', 'default': ''}, params['name']['schema'])
+        self.assertEqual([1, 2], params['gender']['schema']['enum'])
+        self.assertFalse(params['gender']['required'])
+
+        post = spec['paths']['/user/{user_id}']['post']
+        schema = post['requestBody']['content']['multipart/form-data']['schema']
+        self.assertEqual({'type': 'string', 'format': 'binary', 'title': '头像'}, schema['properties']['avatar'])
+        self.assertNotIn('head', spec['paths']['/user/{user_id}'])
+
+        content = spec['paths']['/json']['post']['requestBody']['content']
+        self.assertEqual(['application/json'], list(content.keys()))
+        self.assertEqual('object', content['application/json']['schema']['properties']['owner']['type'])
+
+        put = spec['paths']['/raw']['put']
+        self.assertTrue(put['requestBody']['required'])
+        self.assertIn('application/json', put['requestBody']['content'])
+
+    def test_handler(self):
+        response = self.fetch('/openapi')
+        spec = json_loads(response.body)
+        self.assertEqual('Test', spec.info.title)
+        self.assertEqual(304, self.fetch('/openapi', headers={'If-None-Match': response.headers['Etag']}).code)
+        try:
+            import yaml
+        except ImportError:
+            return
+        response = self.fetch('/openapi?format=yaml')
+        self.assertEqual(spec, yaml.safe_load(response.body))
+
+    def test_cli(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            main(['test_openapi.make_app', '--title', 'Cli', '--output', path])
+            with open(path, 'rb') as f:
+                spec = json_loads(f.read())
+        finally:
+            os.remove(path)
+        self.assertEqual('Cli', spec.info.title)
+        self.assertIn('/user/{user_id}', spec.paths)
@@ -1,7 +1,122 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
+import gc
+import os
+import sys
+import time
 import unittest
 
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornadoapi.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+
+class FakeKvdb(object):
+    """
+    记录调用次数的 redis 风格客户端
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        self.round_trips += 1
+        self.data[key] = value
+
+    def delete(self, *keys):
+        self.round_trips += 1
+        for key in keys:
+            self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline(object):
+
+    def __init__(self, kvdb):
+        self.kvdb = kvdb
+        self.commands = []
+
+    def set(self, key, value, ttl=None):
+        self.commands.append((key, value))
+
+    def execute(self):
+        self.kvdb.round_trips += 1
+        self.kvdb.data.update(self.commands)
+
+
+class FakeAsyncKvdb(object):
+    """
+    进程内模拟的异步 kv 服务，每次调用都会让出 IOLoop
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    @gen.coroutine
+    def _call(self, name, *args):
+        self.calls.append(name)
+        for key in args[:1] if name != 'mget' else args[0]:
+            assert isinstance(key, bytes)
+        yield gen.moment
+
+    @gen.coroutine
+    def get(self, key):
+        yield self._call('get', key)
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            value = None
+        raise gen.Return(value)
+
+    @gen.coroutine
+    def set(self, key, value, ttl=None):
+        yield self._call('set', key)
+        assert isinstance(value, bytes)
+        self.data[key] = (value, time.time() + ttl if ttl is not None else None)
+
+    @gen.coroutine
+    def delete(self, key):
+        yield self._call('delete', key)
+        self.data.pop(key, None)
+
+    @gen.coroutine
+    def _mget(self, keys):
+        yield self._call('mget', keys)
+        ret = []
+        for key in keys:
+            value = yield self.get(key)
+            ret.append(value)
+        raise gen.Return(ret)
+
+
+class FakeAsyncRedis(FakeAsyncKvdb):
+
+    def mget(self, keys):
+        return self._mget(keys)
+
+
+class FakeAsyncMemcache(FakeAsyncKvdb):
+
+    @gen.coroutine
+    def multi_get(self, *keys):
+        ret = yield self._mget(keys)
+        raise gen.Return(tuple(ret))
+
 
 class StorageTestCase(unittest.TestCase):
 
@@ -20,6 +135,285 @@ class StorageTestCase(unittest.TestCase):
 
         storage = MemoryStorage()
         self.test_caches(storage)
+        self.check_bulk(storage)
+
+    def check_bulk(self, storage):
+        from tornadoapi.storage.cache import SampleCache
+        cache = SampleCache(storage)
+        cache.test_item1.mset({'a': 1, 'b': [2], 'c': None})
+        self.assertEqual([1, [2], None], cache.test_item1.mget(['a', 'b', 'c']))
+        cache.test_item1.mdelete(['a', 'c'])
+        self.assertEqual([None, [2]], cache.test_item1.mget(['a', 'b']))
+
+    def test_memory_storage_eviction(self):
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        storage = MemoryStorage(max_entries=3)
+        for key in 'abc':
+            storage.set(key, key)
+        storage.get('a')
+        storage.set('d', 'd')
+        self.assertEqual([None, 'a', 'c', 'd'], storage.mget('bacd'))
+        self.assertEqual({'entries': 3, 'bytes': 0, 'hits': 4, 'misses': 1, 'evictions': 1, 'expirations': 0},
+                         storage.get_stats())
+
+        storage = MemoryStorage(max_bytes=1000)
+        storage.set('small', 'x')
+        storage.set('big', 'x' * 2000)
+        storage.set('medium1', 'x' * 400)
+        self.assertEqual(['x', None], storage.mget(['small', 'big']))
+        storage.set('medium2', 'x' * 500)
+        self.assertEqual(['x', None, 'x' * 500], storage.mget(['small', 'medium1', 'medium2']))
+        self.assertLessEqual(storage.used_bytes, 1000)
+        self.assertEqual(1, storage.evictions)
+
+    def test_memory_storage_expiry(self):
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        storage = MemoryStorage(sweep_batch=2)
+        storage.mset({'a': 1, 'b': 2, 'c': 3}, -1)
+        storage.set('d', 4)
+        self.assertIsNone(storage.get('a'))
+        self.assertEqual(3, len(storage))
+        # 一批全部过期时继续检查下一批
+        self.assertEqual(2, storage.sweep())
+        self.assertEqual(0, storage.sweep())
+        self.assertEqual(1, len(storage))
+        self.assertEqual(3, storage.expirations)
+
+        # 下次从上次结束的位置继续，不改变 key 的顺序
+        storage = MemoryStorage(sweep_batch=2)
+        storage.mset({'a': 1, 'b': 2}, 60)
+        storage.mset(dict(('x%d' % i, i) for i in range(4)), -1)
+        self.assertEqual(0, storage.sweep())
+        self.assertEqual(4, storage.sweep())
+        self.assertEqual(['a', 'b'], list(storage._data.keys()))
+
+        # 限制大小时保持顺序，跳过未过期的 key
+        storage = MemoryStorage(max_entries=100, sweep_batch=2)
+        storage.mset({'a': 1}, 60)
+        storage.mset(dict(('x%d' % i, i) for i in range(5)), -1)
+        storage.mset({'b': 1}, 60)
+        self.assertEqual(5, storage.sweep())
+        self.assertEqual(['a', 'b'], list(storage._data.keys()))
+
+        # 头部未过期时之后的过期数据也会被清除
+        storage = MemoryStorage(max_entries=100, sweep_batch=2)
+        storage.mset(dict(('a%d' % i, i) for i in range(4)), 60)
+        storage.mset(dict(('x%d' % i, i) for i in range(3)), -1)
+        self.assertEqual([0, 0, 3], [storage.sweep() for _ in range(3)])
+        self.assertEqual(['a0', 'a1', 'a2', 'a3'], sorted(storage._data.keys()))
+        storage.set('y', 1, -1)
+        storage.get('a0')
+        self.assertEqual(1, sum(storage.sweep() for _ in range(3)))
+        self.assertEqual(4, len(storage))
+
+    def test_tiered_storage(self):
+        from tornadoapi.storage.memorystorage import MemoryStorage
+        from tornadoapi.storage.tieredstorage import LocalInvalidator, TieredStorage
+
+        remote = MemoryStorage()
+        storage1 = TieredStorage(remote, invalidator=LocalInvalidator('test'))
+        storage2 = TieredStorage(remote, invalidator=LocalInvalidator('test'))
+        self.test_caches(storage1)
+        self.check_bulk(storage1)
+
+        storage1.set('key', 1, 60)
+        self.assertEqual(1, storage2.get('key'))
+        hits = remote.hits
+        self.assertEqual([1, None], storage2.mget(['key', 'none']))
+        self.assertEqual(1, storage2.get('key'))
+        self.assertEqual(hits, remote.hits)
+
+        storage1.set('key', 2)
+        self.assertEqual(2, storage2.get('key'))
+        storage2.mset({'key': 3, 'other': 4})
+        self.assertEqual([3, 4], storage1.mget(['key', 'other']))
+        storage1.delete('key')
+        self.assertIsNone(storage2.get('key'))
+        storage2.mdelete(['other'])
+        self.assertIsNone(storage1.get('other'))
+
+        storage = TieredStorage(remote, local_ttl=-1)
+        storage.set('key', 5)
+        remote.set('key', 6)
+        self.assertEqual(6, storage.get('key'))
+
+        storage1.set('key', 7)
+        storage1.invalidate_local(None)
+        self.assertEqual(0, len(storage1.local))
+
+        invalidator = LocalInvalidator('closed')
+        invalidator.close()
+        self.assertNotIn('closed', LocalInvalidator._channels)
+        LocalInvalidator('collected')
+        gc.collect()
+        self.assertEqual(0, len(LocalInvalidator._channels['collected']))
+
+    def test_kv_storage_bulk(self):
+        from tornadoapi.storage.kvstorage import KvStorage
+
+        kvdb = FakeKvdb()
+        storage = KvStorage(kvdb, chunk_size=100)
+        self.check_bulk(storage)
+        kvdb.round_trips = 0
+        storage.mset(dict(('key%d' % i, i) for i in range(250)), 60)
+        self.assertEqual(3, kvdb.round_trips)
+        self.assertEqual(list(range(250)), storage.mget(['key%d' % i for i in range(250)]))
+        storage.mdelete(['key%d' % i for i in range(250)])
+        self.assertEqual(9, kvdb.round_trips)
+        self.assertEqual(['cache:sample:test_item1:b'], list(kvdb.data.keys()))
+
+    def test_serializers(self):
+        import datetime
+        import decimal
+        import uuid
+        from tornadoapi.storage.serializers import (
+            CompressedSerializer, FixedOffset, JSONSerializer, MsgpackSerializer, PickleSerializer
+        )
+
+        now = datetime.datetime(2020, 1, 2, 3, 4, 5, 678)
+        serializer = JSONSerializer()
+        data = serializer.dumps({'a': [1, 'b'], 'now': now})
+        self.assertIsInstance(data, bytes)
+        self.assertEqual({'a': [1, 'b'], 'now': '2020-01-02 03:04:05'}, serializer.loads(data))
+
+        value = {
+            'now': now,
+            'aware': now.replace(tzinfo=FixedOffset(480)),
+            'date': now.date(),
+            'time': now.time(),
+            'decimal': decimal.Decimal('1.10'),
+            'uuid': uuid.uuid4(),
+            'tuple': (1, [2, (3,)]),
+            'bytes': b'\x00\xff',
+        }
+        for serializer in (MsgpackSerializer(), PickleSerializer()):
+            ret = serializer.loads(serializer.dumps(value))
+            self.assertEqual(value, ret)
+            self.assertEqual(datetime.timedelta(hours=8), ret['aware'].utcoffset())
+            self.assertIsInstance(ret['tuple'][1][1], tuple)
+
+        serializer = CompressedSerializer(min_length=100)
+        small = serializer.dumps('a')
+        self.assertEqual(b'\x00', small[:1])
+        large = serializer.dumps('a' * 1000)
+        self.assertEqual(b'\x01', large[:1])
+        self.assertLess(len(large), 100)
+        self.assertEqual('a', serializer.loads(small))
+        self.assertEqual('a' * 1000, serializer.loads(large))
+        self.assertEqual({'old': 1}, serializer.loads(b'{"old": 1}'))
+
+    def test_kv_storage_serializer(self):
+        from tornadoapi.storage.kvstorage import KvStorage
+        from tornadoapi.storage.serializers import CompressedSerializer, MsgpackSerializer
+
+        kvdb = FakeKvdb()
+        KvStorage(kvdb).set('old', {'a': 1})
+        storage = KvStorage(kvdb, serializer=CompressedSerializer(MsgpackSerializer(), min_length=10))
+        storage.set('key', (1, 2))
+        storage.mset({'large': 'a' * 100})
+        self.assertEqual((1, 2), storage.get('key'))
+        self.assertEqual(b'\x01', kvdb.data['cache:large'][:1])
+        self.assertEqual(['a' * 100, None], storage.mget(['large', 'missing']))
+        self.assertEqual({'a': 1}, KvStorage(kvdb, serializer=CompressedSerializer()).get('old'))
+
+    def test_kv_storage_without_settings(self):
+        from tornadoapi.core.functional import empty
+        from tornadoapi.storage.kvstorage import KvStorage
+
+        storage = KvStorage(FakeKvdb())
+        wrapped = settings._wrapped
+        settings._wrapped = empty
+        try:
+            storage.set('key', {'a': [1, 'b']})
+            self.assertEqual({'a': [1, 'b']}, storage.get('key'))
+        finally:
+            settings._wrapped = wrapped
+
+    def test_cache_stats(self):
+        from tornadoapi.storage import stats
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        cache = SampleCache(MemoryStorage(max_entries=2))
+        stats.reset_cache_stats()
+        cache.test_item1.set('a', 1)
+        self.assertIsNone(cache.get_stats())
+
+        settings.CACHE_STATS = True
+        try:
+            cache.test_item1.set('a', 1)
+            cache.test_item1.get('a')
+            cache.test_item1.get('b', 0)
+            cache.test_item1.mget(['a', 'b'])
+            cache.test_item2.mset({'a': 'x', 'b': 'y'})
+            cache.test_item2.delete('a')
+        finally:
+            settings.CACHE_STATS = False
+        cache.test_item1.get('a')
+
+        item_stats = cache.test_item1.get_stats()
+        self.assertEqual((2, 2, 1, 0.5), tuple(item_stats[k] for k in ('hits', 'misses', 'sets', 'hit_rate')))
+        self.assertGreater(item_stats['bytes_read'], 0)
+        self.assertEqual(['get', 'mget', 'set'], sorted(item_stats['latency']))
+        self.assertEqual(1, item_stats['evictions'])
+        self.assertEqual(2, item_stats['latency']['get']['count'])
+        self.assertEqual(['+Inf', 2], item_stats['latency']['get']['buckets'][-1])
+        item_stats = cache.test_item2.get_stats()
+        self.assertEqual((2, 1, 0), tuple(item_stats[k] for k in ('sets', 'deletes', 'evictions')))
+        cache_stats = cache.get_stats()
+        self.assertEqual((2, 3, 1), tuple(cache_stats[k] for k in ('hits', 'sets', 'evictions')))
+        self.assertEqual(['test_item1', 'test_item2'], sorted(cache_stats['items']))
+        stats.reset_cache_stats()
+        self.assertEqual({}, stats.get_cache_stats())
+
+    def test_sharded_storage(self):
+        from tornadoapi.storage.memorystorage import MemoryStorage
+        from tornadoapi.storage.shardedstorage import ShardedStorage
+
+        storage = ShardedStorage(dict(('node%d' % i, MemoryStorage()) for i in range(3)))
+        self.test_caches(storage)
+        self.check_bulk(storage)
+        storage.close()
+
+        nodes = dict(('node%d' % i, MemoryStorage()) for i in range(3))
+        storage = ShardedStorage(nodes)
+
+        keys = ['key%d' % i for i in range(3000)]
+        storage.mset(dict((key, key) for key in keys))
+        self.assertEqual(keys, storage.mget(keys))
+        self.assertEqual([None, 'key1'], storage.mget(['missing', 'key1']))
+        for node in nodes.values():
+            self.assertGreater(len(node), 700)
+        self.assertEqual(3000, sum(len(node) for node in nodes.values()))
+
+        before = dict((key, storage.ring.get_node(key)) for key in keys)
+        storage.add_node('node3', MemoryStorage())
+        moved = [key for key in keys if storage.ring.get_node(key) != before[key]]
+        self.assertTrue(0.15 < len(moved) / 3000.0 < 0.35)
+        self.assertTrue(all(storage.ring.get_node(key) == 'node3' for key in moved))
+        self.assertIsNone(storage.get(moved[0]))
+
+        storage.remove_node('node3')
+        self.assertEqual(before, dict((key, storage.ring.get_node(key)) for key in keys))
+        self.assertEqual(keys, storage.mget(keys))
+        storage.mdelete(keys)
+        self.assertEqual(0, sum(len(node) for node in nodes.values()))
+
+        # 增加节点后 executor 按节点数量重新创建
+        self.assertEqual(3, storage._executor_workers)
+        storage.add_node('node4', MemoryStorage())
+        storage.add_node('node5', MemoryStorage())
+        storage.mset(dict((key, key) for key in keys))
+        self.assertEqual(5, storage._executor_workers)
+        self.assertEqual(keys, storage.mget(keys))
+        storage.close()
+
+        empty_storage = ShardedStorage({})
+        self.assertEqual([], empty_storage.mget([]))
+        with self.assertRaises(LookupError):
+            empty_storage.get('key')
 
     def test_redis_storage(self):
         from redis import Redis
@@ -35,3 +429,383 @@ class StorageTestCase(unittest.TestCase):
         memcached = Client(servers)
         storage = KvStorage(memcached)
         self.test_caches(storage)
+
+
+class AsyncStorageTestCase(AsyncTestCase):
+
+    @gen.coroutine
+    def check_async_kv_storage(self, kvdb):
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.kvstorage import AsyncKvStorage
+
+        cache = SampleCache(AsyncKvStorage(kvdb))
+        self.assertTrue(cache.test_item1.is_async)
+        yield cache.test_item1.set('key', {'a': 1}, 7200)
+        yield cache.test_item1.set('none', None)
+        self.assertEqual({'a': 1}, (yield cache.test_item1.get('key')))
+        self.assertEqual('default', (yield cache.test_item1.get('none', 'default')))
+        self.assertEqual([{'a': 1}, None], (yield cache.test_item1.mget(['key', 'none'])))
+        yield cache.storage.mset({'k1': 1, 'k2': [2]}, 60)
+        self.assertEqual([1, [2]], (yield cache.storage.mget(['k1', 'k2'])))
+        yield cache.test_item1.delete('key')
+        self.assertIsNone((yield cache.test_item1.get('key')))
+        yield cache.test_item2.mset({'a': 1, 'b': 2})
+        yield cache.test_item2.mdelete(['a'])
+        self.assertEqual([None, 2], (yield cache.test_item2.mget(['a', 'b'])))
+        self.assertTrue((yield cache.storage.add('k3', 3, 60)))
+        self.assertFalse((yield cache.storage.add('k3', 4, 60)))
+        self.assertEqual(3, (yield cache.storage.get('k3')))
+        yield cache.storage.mdelete(['k1', 'k2', 'k3'])
+
+    @gen_test
+    def test_async_kv_storage(self):
+        for kvdb in (FakeAsyncRedis(), FakeAsyncMemcache()):
+            yield self.check_async_kv_storage(kvdb)
+            self.assertIn('mget', kvdb.calls)
+
+    @gen_test
+    def test_async_redis_storage(self):
+        from fakeredis import FakeAsyncRedis as AsyncRedis
+        yield self.check_async_kv_storage(AsyncRedis())
+
+    @gen_test
+    def test_async_memcache_storage(self):
+        from aiomcache import Client
+        yield self.check_async_kv_storage(Client('127.0.0.1', 11211))
+
+    @gen_test
+    def test_memory_storage_sweep(self):
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        storage = MemoryStorage(sweep_interval=0.01)
+        storage.mset(dict((i, i) for i in range(10)), -1)
+        storage.start_sweep()
+        try:
+            yield gen.sleep(0.05)
+        finally:
+            storage.stop_sweep()
+        self.assertEqual(0, len(storage))
+
+    @gen_test
+    def test_unix_socket_invalidator(self):
+        import shutil
+        import socket
+        import tempfile
+        from tornadoapi.storage.tieredstorage import UnixSocketInvalidator
+
+        if not hasattr(socket, 'AF_UNIX'):
+            return
+        directory = tempfile.mkdtemp()
+        received = []
+
+        @gen.coroutine
+        def wait(count, size=len):
+            for _ in range(100):
+                if size(received) >= count:
+                    break
+                yield gen.sleep(0.01)
+
+        invalidators = [UnixSocketInvalidator(directory, max_message_size=200) for _ in range(3)]
+        try:
+            for invalidator in invalidators:
+                invalidator.subscribe(received.append)
+                invalidator.start()
+            with open(os.path.join(directory, 'dead.sock'), 'w'):
+                pass
+            invalidators[0].publish(['a', 'b'])
+            yield wait(2)
+            self.assertEqual([['a', 'b'], ['a', 'b']], received)
+            self.assertFalse(os.path.exists(os.path.join(directory, 'dead.sock')))
+
+            # 超过 max_message_size 的消息拆分发送，单个 key 过大时通知清空
+            del received[:]
+            keys = ['key%020d' % i for i in range(30)]
+            invalidators[1].publish(keys)
+            yield wait(60, lambda chunks: sum(len(chunk) for chunk in chunks))
+            self.assertGreater(len(received), 2)
+            self.assertEqual(sorted(keys * 2), sorted(key for chunk in received for key in chunk))
+            del received[:]
+            invalidators[1].publish(['x' * 300])
+            yield wait(2)
+            self.assertEqual([None, None], received)
+
+            # 接收时被截断的消息同样通知清空
+            del received[:]
+            invalidators[0].max_message_size = 1000
+            invalidators[0].publish(['x' * 300])
+            yield wait(2)
+            self.assertEqual([None, None], received)
+
+            # socket 列表按 peer_refresh_interval 缓存
+            del received[:]
+            invalidators[0].peer_refresh_interval = 3600
+            late = UnixSocketInvalidator(directory)
+            invalidators.append(late)
+            late.subscribe(received.append)
+            late.start()
+            invalidators[0].publish(['c'])
+            yield wait(2)
+            yield gen.sleep(0.05)
+            self.assertEqual([['c'], ['c']], received)
+            invalidators[0].peer_refresh_interval = 0
+            invalidators[0].publish(['d'])
+            yield wait(5)
+            self.assertEqual(3, received.count(['d']))
+        finally:
+            for invalidator in invalidators:
+                invalidator.close()
+            shutil.rmtree(directory)
+
+    @gen_test
+    def test_async_cache_stats(self):
+        from tornadoapi.storage import stats
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.kvstorage import AsyncKvStorage
+
+        cache = SampleCache(AsyncKvStorage(FakeAsyncRedis()))
+        stats.reset_cache_stats()
+        settings.CACHE_STATS = True
+        try:
+            yield cache.test_item1.set('a', 1)
+            yield cache.test_item1.get('a')
+            yield cache.test_item1.mget(['a', 'b'])
+            yield cache.test_item1.get_or_compute('c', lambda: 3)
+        finally:
+            settings.CACHE_STATS = False
+        item_stats = cache.test_item1.get_stats()
+        self.assertEqual((2, 2, 2), tuple(item_stats[k] for k in ('hits', 'misses', 'sets')))
+        self.assertEqual(3, item_stats['latency']['get']['count'] + item_stats['latency']['mget']['count'])
+        stats.reset_cache_stats()
+
+    @gen_test
+    def test_async_sharded_storage(self):
+        from tornadoapi.storage.kvstorage import AsyncKvStorage
+        from tornadoapi.storage.shardedstorage import AsyncShardedStorage
+
+        kvdbs = [FakeAsyncRedis() for _ in range(3)]
+        storage = AsyncShardedStorage(dict(('node%d' % i, AsyncKvStorage(kvdb)) for i, kvdb in enumerate(kvdbs)))
+        keys = ['key%d' % i for i in range(300)]
+        yield storage.mset(dict((key, key) for key in keys))
+        self.assertTrue(all(kvdb.data for kvdb in kvdbs))
+        self.assertEqual(keys + [None], (yield storage.mget(keys + ['missing'])))
+        yield storage.set('one', 1)
+        self.assertEqual(1, (yield storage.get('one')))
+        self.assertFalse((yield storage.add('one', 2)))
+        yield storage.mdelete(keys + ['one'])
+        self.assertFalse(any(kvdb.data for kvdb in kvdbs))
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'async def requires Python 3.5+')
+    @gen_test
+    def test_async_def_storage_stats(self):
+        from tornadoapi.storage import AsyncBaseStorage, stats
+        from tornadoapi.storage.cache import SampleCache
+
+        namespace = {'AsyncBaseStorage': AsyncBaseStorage}
+        exec('\n'.join([
+            'class AsyncDefStorage(AsyncBaseStorage):',
+            '    def __init__(self):',
+            '        self.data = {}',
+            '    async def get(self, key, default=None):',
+            '        return self.data.get(key, default)',
+            '    async def set(self, key, value, ttl=None):',
+            '        self.data[key] = value',
+            '    async def delete(self, key):',
+            '        self.data.pop(key, None)',
+        ]), namespace)
+
+        cache = SampleCache(namespace['AsyncDefStorage']())
+        stats.reset_cache_stats()
+        settings.CACHE_STATS = True
+        try:
+            yield cache.test_item1.set('a', 1)
+            self.assertEqual(1, (yield cache.test_item1.get('a')))
+            self.assertIsNone((yield cache.test_item1.get('b')))
+            yield cache.test_item1.delete('a')
+        finally:
+            settings.CACHE_STATS = False
+        item_stats = cache.test_item1.get_stats()
+        self.assertEqual((1, 1, 1, 1), tuple(item_stats[k] for k in ('hits', 'misses', 'sets', 'deletes')))
+        stats.reset_cache_stats()
+
+    @gen_test
+    def test_get_or_compute(self):
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.kvstorage import AsyncKvStorage
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        calls = []
+
+        @gen.coroutine
+        def producer():
+            calls.append(1)
+            yield gen.sleep(0.01)
+            raise gen.Return(len(calls))
+
+        for storage in (MemoryStorage(), AsyncKvStorage(FakeAsyncRedis())):
+            del calls[:]
+            item = SampleCache(storage).test_item1
+            values = yield [item.get_or_compute('key', producer, 60) for _ in range(5)]
+            self.assertEqual([1] * 5, values)
+            self.assertEqual(1, (yield item.get_or_compute('key', producer, 60)))
+            self.assertEqual(1, len(calls))
+            self.assertEqual('sync', (yield item.get_or_compute('sync', lambda: 'sync')))
+
+    @gen_test
+    def test_get_or_compute_refresh(self):
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        storage = MemoryStorage()
+        item = SampleCache(storage).test_item1
+        counter = iter(range(1, 100))
+        producer = lambda: next(counter)  # noqa: E731
+
+        self.assertEqual(1, (yield item.get_or_compute('key', producer, 60, stale_ttl=60)))
+        entry = storage.get(item.key_name('key'))
+        storage.set(item.key_name('key'), dict(entry, expires_at=time.time() - 1), 60)
+        # 过期后返回旧值，后台重新计算
+        self.assertEqual(1, (yield item.get_or_compute('key', producer, 60, stale_ttl=60)))
+        yield gen.moment
+        self.assertEqual(2, (yield item.get_or_compute('key', producer, 60, stale_ttl=60)))
+
+        # 计算耗时相对剩余时间很大时提前刷新
+        entry = storage.get(item.key_name('key'))
+        storage.set(item.key_name('key'), dict(entry, delta=1000), 60)
+        item.random_func = lambda: 0.5
+        self.assertEqual(2, (yield item.get_or_compute('key', producer, 60)))
+        yield gen.moment
+        self.assertEqual(3, (yield item.get_or_compute('key', producer, 60, beta=0)))
+
+    @gen_test
+    def test_get_or_compute_lock(self):
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        storage = MemoryStorage()
+        item = SampleCache(storage).test_item1
+        storage.add(item.key_name('key') + ':lock', 1, 10)
+
+        @gen.coroutine
+        def other_process():
+            yield gen.sleep(0.02)
+            storage.set(item.key_name('key'), {'value': 'other', 'expires_at': time.time() + 60, 'delta': 0}, 60)
+            storage.delete(item.key_name('key') + ':lock')
+
+        producer = lambda: 'mine'  # noqa: E731
+        values = yield [item.get_or_compute('key', producer, 60, lock_ttl=10, lock_interval=0.01), other_process()]
+        self.assertEqual('other', values[0])
+        self.assertIsNone(storage.get(item.key_name('key') + ':lock'))
+        value = yield item.get_or_compute('timeout', producer, 60, lock_ttl=10, lock_wait=0.02, lock_interval=0.01)
+        self.assertEqual('mine', value)
+
+    @gen_test
+    def test_get_or_compute_join_refresh(self):
+        from tornadoapi.storage import AsyncBaseStorage
+        from tornadoapi.storage.cache import SampleCache
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        memory = MemoryStorage()
+
+        class SlowLockStorage(AsyncBaseStorage):
+            @gen.coroutine
+            def get(self, key, default=None):
+                raise gen.Return(memory.get(key, default))
+
+            @gen.coroutine
+            def set(self, key, value, ttl=None):
+                memory.set(key, value, ttl)
+
+            @gen.coroutine
+            def delete(self, key):
+                memory.delete(key)
+
+            @gen.coroutine
+            def add(self, key, value, ttl=None):
+                yield gen.sleep(0.01)
+                raise gen.Return(memory.add(key, value, ttl))
+
+        item = SampleCache(SlowLockStorage()).test_item1
+        key_name = item.key_name('key')
+        memory.set(key_name, {'value': 'old', 'expires_at': time.time() - 1, 'delta': 0}, 60)
+        memory.add(key_name + ':lock', 1, 10)
+        producer = lambda: 'mine'  # noqa: E731
+
+        # 过期后返回旧值，后台刷新等待获取锁
+        self.assertEqual('old', (yield item.get_or_compute('key', producer, 60, stale_ttl=60, lock_ttl=10)))
+        memory.delete(key_name)
+
+        @gen.coroutine
+        def other_process():
+            yield gen.sleep(0.05)
+            memory.set(key_name, {'value': 'other', 'expires_at': time.time() + 60, 'delta': 0}, 60)
+            memory.delete(key_name + ':lock')
+
+        # 后台刷新未获得锁时，等待它的请求按自己的 lock_wait 继续等待其他进程的结果
+        values = yield [
+            item.get_or_compute('key', producer, 60, lock_ttl=10, lock_wait=1, lock_interval=0.01), other_process()
+        ]
+        self.assertEqual('other', values[0])
+
+    @gen_test
+    def test_cached(self):
+        from tornadoapi.storage.cache import SampleCache, cached
+        from tornadoapi.storage.kvstorage import AsyncKvStorage
+        from tornadoapi.storage.memorystorage import MemoryStorage
+
+        cache = SampleCache(MemoryStorage())
+        calls = []
+
+        @cached(cache.test_item1, ttl=60, negative_ttl=60)
+        def lookup(user_id, detail=False):
+            calls.append(user_id)
+            return {'id': user_id, 'detail': detail} if user_id else None
+
+        self.assertEqual({'id': 1, 'detail': True}, lookup(1, detail=True))
+        self.assertEqual({'id': 1, 'detail': True}, lookup(1, detail=True))
+        self.assertIsNone(lookup(0))
+        self.assertIsNone(lookup(0))
+        self.assertEqual([1, 0], calls)
+        self.assertEqual(['#i1', 'detail=#true'], lookup.cache_key(1, detail=True))
+        # 字符串与其他类型的值生成不同的 key
+        parts = [
+            lookup.cache_key(value)[0]
+            for value in ('1', 1, 1.0, 'None', None, 'True', True, '#i1', 'a:b', 'a=b', [1], ['1'])
+        ]
+        self.assertEqual(len(parts), len(set(parts)))
+        self.assertEqual(['abc', 'x=abc'], lookup.cache_key('abc', x='abc'))
+        lookup.invalidate(1, detail=True)
+        lookup(1, detail=True)
+        self.assertEqual([1, 0, 1], calls)
+
+        class Service(object):
+            @cached(cache.test_item2)
+            def name(self, user_id):
+                calls.append(user_id)
+                return None if user_id == 3 else 'name%s' % user_id
+
+        Service().name(2)
+        Service().name(3)
+        self.assertEqual('name2', Service().name(2))
+        Service().name(3)
+        self.assertEqual([1, 0, 1, 2, 3, 3], calls)
+        key = Service.name.cache_key(None, 2)
+        self.assertEqual('name2', cache.test_item2.get(key))
+        Service.name.invalidate(2)
+        self.assertIsNone(cache.test_item2.get(key))
+
+        async_cache = SampleCache(AsyncKvStorage(FakeAsyncRedis()))
+
+        @cached(async_cache.test_item1)
+        @gen.coroutine
+        def async_lookup(user_id):
+            calls.append(user_id)
+            yield gen.moment
+            raise gen.Return(user_id * 10)
+
+        self.assertEqual(40, (yield async_lookup(4)))
+        self.assertEqual(40, (yield async_lookup(4)))
+        self.assertEqual(1, calls.count(4))
+        key = async_lookup.cache_key(4)
+        self.assertEqual(40, (yield async_cache.test_item1.get(key)))
+        yield async_lookup.invalidate(4)
+        self.assertIsNone((yield async_cache.test_item1.get(key)))
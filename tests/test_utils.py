@@ -1,8 +1,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
+import datetime
+import decimal
+import json
 import unittest
+import uuid
 
-from tornadoapi.core import ObjectDict
+from tornadoapi.conf import settings
+from tornadoapi.core import ObjectDict, json_dumps
+from tornadoapi.core.encoder import get_json_encoder
+from tornadoapi.core.functional import empty
+from tornadoapi.core.negotiation import ContentNegotiator, parse_accept
+
+
+def configure_settings():
+    if not settings.configured:
+        settings.configure()
 
 
 class UtilityTestCase(unittest.TestCase):
@@ -14,3 +27,88 @@ class UtilityTestCase(unittest.TestCase):
         obj.xxx = 1
         self.assertEqual(1, obj.xxx)
         self.assertEqual(obj['xxx'], obj.xxx)
+
+    def test_json_dumps_without_settings(self):
+        wrapped = settings._wrapped
+        settings._wrapped = empty
+        try:
+            self.assertEqual('{"a": [1, "b"]}', json_dumps({'a': [1, 'b']}))
+        finally:
+            settings._wrapped = wrapped
+
+    def test_json_encoder(self):
+        configure_settings()
+        data = {
+            'datetime': datetime.datetime(2018, 1, 2, 3, 4, 5),
+            'date': datetime.date(2018, 1, 2),
+            'time': datetime.time(3, 4, 5),
+            'decimal': decimal.Decimal('1.10'),
+            'uuid': uuid.UUID(int=1),
+            1: [1, 'a'],
+        }
+        expected = {
+            'datetime': '2018-01-02 03:04:05',
+            'date': '2018-01-02',
+            'time': '03:04:05',
+            'decimal': '1.10',
+            'uuid': '00000000-0000-0000-0000-000000000001',
+            '1': [1, 'a'],
+        }
+        self.assertEqual(expected, json.loads(json_dumps(data)))
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            return
+        self.assertEqual(expected, json.loads(get_json_encoder('orjson')(data)))
+        self.assertEqual({'a': 2 ** 70}, json.loads(get_json_encoder('orjson')({'a': 2 ** 70})))
+        # 日期格式在创建序列化函数时读取，修改 settings 后重新创建
+        date_format = settings.DATE_FORMAT
+        settings.DATE_FORMAT = '%Y/%m/%d'
+        try:
+            self.assertEqual(b'"2018/01/02"', get_json_encoder('orjson')(datetime.date(2018, 1, 2)))
+        finally:
+            settings.DATE_FORMAT = date_format
+        self.assertEqual(b'"2018-01-02"', get_json_encoder('orjson')(datetime.date(2018, 1, 2)))
+        with self.assertRaises(TypeError):
+            get_json_encoder('orjson')(object())
+
+    def test_code_envelope(self):
+        configure_settings()
+        from tornadoapi.core.err_code import ErrCode
+        self.assertEqual({'code': 0, 'message': ErrCode.SUCCESS.message}, ErrCode.SUCCESS.get_res_dict())
+        self.assertEqual(ErrCode.SUCCESS.get_res_dict(), json.loads(ErrCode.SUCCESS.get_res_json().decode('utf-8')))
+        data = {'a': [1, '参数']}
+        self.assertEqual(
+            ErrCode.ERR_COMMON_BAD_PARAM.get_res_dict(data=data),
+            json.loads(ErrCode.ERR_COMMON_BAD_PARAM.get_res_json(data=data).decode('utf-8'))
+        )
+        self.assertEqual(
+            json_dumps(ErrCode.ERR_COMMON_BAD_PARAM.get_res_dict(data=data)).encode('utf-8'),
+            ErrCode.ERR_COMMON_BAD_PARAM.get_res_json(data=data)
+        )
+        settings.RESPONSE_CODE_TAG = 'err_code'
+        try:
+            self.assertEqual(
+                {'err_code': -11, 'message': 'msg', 'data': 1},
+                ErrCode.ERR_COMMON_BAD_PARAM.get_res_dict(message='msg', data=1)
+            )
+            self.assertEqual(0, json.loads(ErrCode.SUCCESS.get_res_json().decode('utf-8'))['err_code'])
+        finally:
+            settings.RESPONSE_CODE_TAG = 'code'
+        self.assertEqual('code', ErrCode.SUCCESS.get_code_tag())
+
+    def test_content_negotiation(self):
+        self.assertEqual(
+            [('application/json', 1.0), ('text/html', 0.8)],
+            parse_accept('text/html;q=0.8, application/json, text/plain;q=0')
+        )
+        negotiator = ContentNegotiator(
+            [('application/json', 'json'), ('+json', 'json'), ('application/javascript', 'jsonp')], cache_size=2
+        )
+        self.assertEqual('jsonp', negotiator.negotiate('application/json;q=0.5, application/javascript'))
+        self.assertEqual('json', negotiator.negotiate('application/vnd.api+json'))
+        self.assertEqual('json', negotiator.negotiate('text/html, application/*;q=0.1'))
+        self.assertIsNone(negotiator.negotiate('text/html,application/xhtml+xml,*/*;q=0.8'))
+        self.assertEqual(2, len(negotiator._cache))
+        negotiator.register('application/msgpack', 'msgpack')
+        self.assertEqual('msgpack', negotiator.negotiate('application/msgpack'))
@@ -9,6 +9,23 @@ from tornadoapi.core.functional import LazyObject, empty
 
 ENVIRONMENT_VARIABLE = "TORNADOAPI_SETTINGS_MODULE"
 
+_setting_changed_receivers = []
+
+
+def connect_setting_changed(receiver):
+    """
+    注册 settings 修改回调 receiver(name)，重新配置 settings 时 name 为 None，
+    用于清除根据 settings 生成的缓存
+    """
+    if receiver not in _setting_changed_receivers:
+        _setting_changed_receivers.append(receiver)
+    return receiver
+
+
+def setting_changed(name=None):
+    for receiver in _setting_changed_receivers:
+        receiver(name)
+
 
 class LazySettings(LazyObject):
     def _setup(self, name=None):
@@ -51,6 +68,7 @@ class LazySettings(LazyObject):
         else:
             self.__dict__.pop(name, None)
         super(LazySettings, self).__setattr__(name, value)
+        setting_changed(None if name == '_wrapped' else name)
 
     def __delattr__(self, name):
         """
@@ -58,6 +76,7 @@ class LazySettings(LazyObject):
         """
         super(LazySettings, self).__delattr__(name)
         self.__dict__.pop(name, None)
+        setting_changed(name)
 
     def configure(self, default_settings=global_settings, **options):
         """
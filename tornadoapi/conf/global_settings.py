@@ -77,6 +77,18 @@ RESPONSE_CODE_TAG = 'code'
 RESPONSE_MESSAGE_TAG = 'message'
 RESPONSE_DATA_TAG = 'data'
 
+# ApiHandler json serialize backend: 'json', 'orjson', 'auto' (orjson if installed)
+# or a dotted path to a callable dumps(obj, default) returning str or bytes
+JSON_ENCODER_BACKEND = 'json'
+
+# ApiHandler response compression, None to disable, or a dict of
+# tornadoapi.core.compress.Compressor arguments: encodings, level, min_length, cache_size
+RESPONSE_COMPRESSION = None
+
+# Record hit/miss/latency statistics for tornadoapi.storage.cache.CacheItem,
+# see tornadoapi.storage.stats.get_cache_stats
+CACHE_STATS = False
+
 # The callable to use to configure logging
 LOGGING_CONFIG = 'logging.config.dictConfig'
 
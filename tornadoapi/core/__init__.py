@@ -7,6 +7,7 @@ import json
 import logging
 import random
 import string
+import sys
 import uuid
 from pprint import pformat
 
@@ -71,21 +72,71 @@ def byte2int(c):
     return c
 
 
+_json_default_cache = {}
+
+
+def _make_strftime(fmt, fast_fmt, fast_func):
+    # isoformat 比 strftime 快很多，格式相同且无时区、年份为 4 位时使用
+    if fmt != fast_fmt or sys.version_info < (3, 6):
+        return lambda o: o.strftime(fmt)
+
+    def strftime(o):
+        if getattr(o, 'tzinfo', None) is None and getattr(o, 'year', 1000) >= 1000:
+            return fast_func(o)
+        return o.strftime(fmt)
+    return strftime
+
+
+def _make_json_default(datetime_format, date_format, time_format):
+    # datetime 是 date 的子类，子类按顺序匹配
+    encoders = (
+        (datetime.datetime, _make_strftime(
+            datetime_format, '%Y-%m-%d %H:%M:%S', lambda o: o.isoformat(' ', 'seconds')
+        )),
+        (datetime.date, _make_strftime(
+            date_format, '%Y-%m-%d', lambda o: o.isoformat()
+        )),
+        (datetime.time, _make_strftime(
+            time_format, '%H:%M:%S', lambda o: o.isoformat('seconds')
+        )),
+        (decimal.Decimal, str),
+        (uuid.UUID, str),
+    )
+    type_encoders = dict(encoders)
+
+    def default(o):
+        encoder = type_encoders.get(type(o))
+        if encoder is None:
+            for cls, cls_encoder in encoders:
+                if isinstance(o, cls):
+                    encoder = cls_encoder
+                    break
+            else:
+                raise TypeError('Object of type %s is not JSON serializable' % o.__class__.__name__)
+        return encoder(o)
+    return default
+
+
+def get_json_default():
+    """
+    返回 json 序列化时间日期、Decimal、UUID 的 default 函数，格式来自 settings，相同格式只创建一次
+    """
+    from tornadoapi.conf import settings
+    key = (settings.SHORT_DATETIME_FORMAT, settings.DATE_FORMAT, settings.TIME_FORMAT)
+    default = _json_default_cache.get(key)
+    if default is None:
+        default = _json_default_cache[key] = _make_json_default(*key)
+    return default
+
+
 class JSONEncoder(json.JSONEncoder):
+    json_default = None
+
     def default(self, o):
-        from tornadoapi.conf import settings
-        if isinstance(o, datetime.datetime):
-            return o.strftime(settings.SHORT_DATETIME_FORMAT)
-        elif isinstance(o, datetime.date):
-            return o.strftime(settings.DATE_FORMAT)
-        elif isinstance(o, datetime.time):
-            return o.strftime(settings.TIME_FORMAT)
-        elif isinstance(o, decimal.Decimal):
-            return str(o)
-        elif isinstance(o, uuid.UUID):
-            return str(o)
-        else:
-            return super(JSONEncoder, self).default(o)
+        # 遇到 json 不支持的类型时才读取 settings，普通数据不依赖 settings
+        if self.json_default is None:
+            self.json_default = get_json_default()
+        return self.json_default(o)
 
 
 def json_dumps(obj, indent=None, cls=JSONEncoder, **kwargs):
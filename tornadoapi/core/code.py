@@ -1,18 +1,31 @@
 # encoding: utf-8
 from __future__ import absolute_import, unicode_literals
 
+from collections import namedtuple
+
 import six
 
-from tornadoapi.conf import settings
-from tornadoapi.core import to_text
+from tornadoapi.conf import settings, connect_setting_changed
+from tornadoapi.core import to_text, to_binary
+
+
+Envelope = namedtuple('Envelope', ('code_tag', 'message_tag', 'data_tag'))
+
+
+def _get_tag(value, default):
+    if value and isinstance(value, six.string_types):
+        return to_text(value)
+    return default
 
 
 class CodeData(object):
+    _envelope = None
 
     def __init__(self, code, tag, message):
         self.code = code
         self.message = message
         self.tag = tag
+        self._res_json = None
 
     def __str__(self):
         return str(self.code)
@@ -25,36 +38,75 @@ class CodeData(object):
         else:
             return super(CodeData, self).__eq__(other)
 
+    @classmethod
+    def get_envelope(cls):
+        """
+        返回值 code message data 对应的 key，修改 settings 后重新生成
+        """
+        envelope = CodeData._envelope
+        if envelope is None:
+            envelope = CodeData._envelope = Envelope(
+                _get_tag(settings.RESPONSE_CODE_TAG, 'code'),
+                _get_tag(settings.RESPONSE_MESSAGE_TAG, 'message'),
+                _get_tag(settings.RESPONSE_DATA_TAG, 'data'),
+            )
+        return envelope
+
     @classmethod
     def get_code_tag(cls):
-        code_tag = 'code'
-        if settings.RESPONSE_CODE_TAG and isinstance(settings.RESPONSE_CODE_TAG, six.string_types):
-            code_tag = to_text(settings.RESPONSE_CODE_TAG)
-        return code_tag
+        return cls.get_envelope().code_tag
 
     @classmethod
     def get_message_tag(cls):
-        message_tag = 'message'
-        if settings.RESPONSE_MESSAGE_TAG and isinstance(settings.RESPONSE_MESSAGE_TAG, six.string_types):
-            message_tag = to_text(settings.RESPONSE_MESSAGE_TAG)
-        return message_tag
+        return cls.get_envelope().message_tag
 
     @classmethod
     def get_data_tag(cls):
-        data_tag = 'data'
-        if settings.RESPONSE_DATA_TAG and isinstance(settings.RESPONSE_DATA_TAG, six.string_types):
-            data_tag = to_text(settings.RESPONSE_DATA_TAG)
-        return data_tag
+        return cls.get_envelope().data_tag
 
     def get_res_dict(self, **kwargs):
+        code_tag, message_tag, data_tag = self.get_envelope()
         ret = dict(kwargs)
-        code_tag = self.get_code_tag()
-        message_tag = self.get_message_tag()
         ret[code_tag] = self.code
         if message_tag not in ret:
             ret[message_tag] = self.message
         return ret
 
+    def _get_res_json_template(self):
+        envelope = self.get_envelope()
+        if self._res_json is None or self._res_json[0] is not envelope:
+            from tornadoapi.core.encoder import get_json_encoder
+            encoder = get_json_encoder()
+            placeholder = '__tonadoapi_data_placeholder__'
+            data_json = to_binary(encoder(self.get_res_dict(**{envelope.data_tag: placeholder})))
+            prefix, suffix = data_json.split(to_binary(encoder(placeholder)), 1)
+            self._res_json = (envelope, encoder, to_binary(encoder(self.get_res_dict())), prefix, suffix)
+        return self._res_json
+
+    def get_res_json_parts(self):
+        """
+        返回 data 前后的 json bytes，data 序列化后拼接在中间即为完整结果
+        """
+        envelope, encoder, res_json, prefix, suffix = self._get_res_json_template()
+        return prefix, suffix
+
+    def get_res_json(self, **kwargs):
+        """
+        返回 get_res_dict 对应的 json bytes，无 data 时直接返回预生成的结果，
+        只有 data 时将 data 序列化后拼接到预生成的结果中
+        """
+        envelope, encoder, res_json, prefix, suffix = self._get_res_json_template()
+        if not kwargs:
+            return res_json
+        if len(kwargs) == 1 and envelope.data_tag in kwargs:
+            return b''.join((prefix, to_binary(encoder(kwargs[envelope.data_tag])), suffix))
+        return to_binary(encoder(self.get_res_dict(**kwargs)))
+
+
+@connect_setting_changed
+def _reset_envelope(name):
+    CodeData._envelope = None
+
 
 class Code(object):
 
@@ -65,7 +117,10 @@ class Code(object):
         self._tags = list()
         for tag, code, message in code_define:
             assert code not in codes and not hasattr(self, tag)
-            setattr(self, tag, CodeData(code, tag, message))
+            code_data = CodeData(code, tag, message)
+            if settings.configured:
+                code_data.get_res_json()
+            setattr(self, tag, code_data)
             codes.add(code)
             self._tags.append(tag)
             self._list.append((code, message))
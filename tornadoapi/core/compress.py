@@ -0,0 +1,153 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+import gzip
+import io
+
+from tornadoapi.conf import connect_setting_changed
+from tornadoapi.core.datastructures import LRUCache
+from tornadoapi.core.functional import empty
+
+ENCODING_GZIP = 'gzip'
+ENCODING_BROTLI = 'br'
+
+LEVEL_FAST = 'fast'
+LEVEL_DEFAULT = 'default'
+LEVEL_BEST = 'best'
+
+# 各压缩方式的等级预设，gzip 为 compresslevel，brotli 为 quality
+COMPRESSION_LEVELS = {
+    LEVEL_FAST: {ENCODING_GZIP: 1, ENCODING_BROTLI: 1},
+    LEVEL_DEFAULT: {ENCODING_GZIP: 6, ENCODING_BROTLI: 5},
+    LEVEL_BEST: {ENCODING_GZIP: 9, ENCODING_BROTLI: 11},
+}
+
+
+def gzip_compress(data, level):
+    buf = io.BytesIO()
+    # mtime 固定为 0，相同内容压缩结果一致
+    with gzip.GzipFile(mode='wb', fileobj=buf, compresslevel=level, mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def brotli_compress(data, level):
+    import brotli
+    return brotli.compress(data, quality=level)
+
+
+def parse_accept_encoding(accept_encoding):
+    """
+    解析 Accept-Encoding 头，返回 {encoding: q}，忽略 q=0
+    """
+    ret = {}
+    for item in accept_encoding.split(','):
+        params = item.split(';')
+        encoding = params[0].strip().lower()
+        if not encoding:
+            continue
+        q = 1.0
+        for param in params[1:]:
+            key, sep, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        ret[encoding] = q
+    return dict((k, v) for k, v in ret.items() if v > 0)
+
+
+class Compressor(object):
+    """
+    根据 Accept-Encoding 压缩返回内容
+
+    :param encodings: 支持的压缩方式，靠前的优先，未安装 brotli 时忽略 br
+    :param level: 压缩等级，'fast'、'default'、'best' 或整数
+    :param min_length: 小于该字节数的内容不压缩
+    :param cache_size: 缓存压缩结果的数量，用于内容不变的页面
+    """
+    compress_funcs = {
+        ENCODING_GZIP: gzip_compress,
+        ENCODING_BROTLI: brotli_compress,
+    }
+
+    def __init__(self, encodings=(ENCODING_BROTLI, ENCODING_GZIP), level=LEVEL_DEFAULT, min_length=1024,
+                 cache_size=32):
+        self.encodings = tuple(e for e in encodings if self.is_available(e))
+        self.levels = dict((e, self.get_level(e, level)) for e in self.encodings)
+        self.min_length = min_length
+        self._choose_cache = LRUCache(256)
+        self._body_cache = LRUCache(cache_size)
+
+    @classmethod
+    def is_available(cls, encoding):
+        if encoding == ENCODING_BROTLI:
+            try:
+                import brotli  # noqa: F401
+            except ImportError:
+                return False
+            return True
+        return encoding in cls.compress_funcs
+
+    @staticmethod
+    def get_level(encoding, level):
+        if isinstance(level, int):
+            return level
+        return COMPRESSION_LEVELS[level][encoding]
+
+    def choose(self, accept_encoding):
+        """
+        返回 Accept-Encoding 中优先级最高的压缩方式，q 相同时按 encodings 顺序，不支持时返回 None
+        """
+        if not accept_encoding:
+            return None
+        encoding = self._choose_cache.get(accept_encoding, empty)
+        if encoding is empty:
+            encoding = self._choose(accept_encoding)
+            self._choose_cache.set(accept_encoding, encoding)
+        return encoding
+
+    def _choose(self, accept_encoding):
+        accepted = parse_accept_encoding(accept_encoding)
+        best, best_q = None, 0
+        for encoding in self.encodings:
+            q = accepted.get(encoding, accepted.get('*', 0))
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, data, encoding, cache=False):
+        """
+        压缩 data，cache 为 True 时按内容缓存压缩结果
+        """
+        if not cache:
+            return self.compress_funcs[encoding](data, self.levels[encoding])
+        key = (encoding, data)
+        ret = self._body_cache.get(key)
+        if ret is None:
+            ret = self.compress_funcs[encoding](data, self.levels[encoding])
+            self._body_cache.set(key, ret)
+        return ret
+
+
+_compressor = empty
+
+
+def get_compressor():
+    """
+    返回 settings.RESPONSE_COMPRESSION 对应的 Compressor，未开启时返回 None
+    """
+    global _compressor
+    if _compressor is empty:
+        from tornadoapi.conf import settings
+        config = settings.RESPONSE_COMPRESSION
+        _compressor = Compressor(**config) if config is not None else None
+    return _compressor
+
+
+@connect_setting_changed
+def _reset_compressor(name):
+    global _compressor
+    if name is None or name == 'RESPONSE_COMPRESSION':
+        _compressor = empty
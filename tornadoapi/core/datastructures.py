@@ -0,0 +1,73 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+from collections import OrderedDict
+
+
+class ImmutableDict(OrderedDict):
+    """
+    只读的 OrderedDict，创建后任何修改操作都会抛出 AttributeError，copy() 返回可修改的 OrderedDict
+    """
+    warning = 'ImmutableDict object is immutable.'
+
+    def __init__(self, *args, **kwargs):
+        super(ImmutableDict, self).__init__(*args, **kwargs)
+        self._frozen = True
+
+    def complain(self, *args, **kwargs):
+        raise AttributeError(self.warning)
+
+    def __setitem__(self, key, value, *args, **kwargs):
+        if getattr(self, '_frozen', False):
+            self.complain()
+        super(ImmutableDict, self).__setitem__(key, value, *args, **kwargs)
+
+    def copy(self):
+        return OrderedDict(self)
+
+    def __reduce__(self):
+        return self.__class__, (list(self.items()),)
+
+    def __hash__(self):
+        return hash(tuple(self.items()))
+
+    __delitem__ = complain
+    clear = complain
+    pop = complain
+    popitem = complain
+    setdefault = complain
+    update = complain
+    move_to_end = complain
+
+
+class LRUCache(object):
+    """
+    按最近使用顺序淘汰的定长缓存
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return default
+        self._data[key] = value
+        return value
+
+    def set(self, key, value):
+        self._data.pop(key, None)
+        if len(self._data) >= self.max_size:
+            self._data.popitem(last=False)
+        self._data[key] = value
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
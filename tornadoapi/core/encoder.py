@@ -0,0 +1,76 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+from tornadoapi.conf import connect_setting_changed
+from tornadoapi.core import get_json_default, json_dumps
+from tornadoapi.core.module_loading import import_string
+
+JSON_BACKEND_JSON = 'json'
+JSON_BACKEND_ORJSON = 'orjson'
+JSON_BACKEND_AUTO = 'auto'
+
+# 序列化函数创建时读取的 settings，修改时重新创建
+JSON_ENCODER_SETTINGS = ('JSON_ENCODER_BACKEND', 'SHORT_DATETIME_FORMAT', 'DATE_FORMAT', 'TIME_FORMAT')
+
+_json_encoder_cache = {}
+
+
+def _json_encoder():
+    return json_dumps
+
+
+def _orjson_encoder():
+    import orjson
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    default = get_json_default()
+
+    def dumps(obj):
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except orjson.JSONEncodeError:
+            # 超过 64 位的整数等 orjson 不支持的数据
+            return json_dumps(obj)
+    return dumps
+
+
+def _custom_encoder(dotted_path):
+    func = import_string(dotted_path)
+    default = get_json_default()
+
+    def dumps(obj):
+        return func(obj, default)
+    return dumps
+
+
+def _load_json_encoder(backend):
+    if backend == JSON_BACKEND_JSON:
+        return _json_encoder()
+    elif backend == JSON_BACKEND_ORJSON:
+        return _orjson_encoder()
+    elif backend == JSON_BACKEND_AUTO:
+        try:
+            return _orjson_encoder()
+        except ImportError:
+            return _json_encoder()
+    return _custom_encoder(backend)
+
+
+def get_json_encoder(backend=None):
+    """
+    返回 ApiHandler 使用的 json 序列化函数 dumps(obj) -> str 或 bytes
+
+    :param backend: 默认为 settings.JSON_ENCODER_BACKEND
+    """
+    if backend is None:
+        from tornadoapi.conf import settings
+        backend = settings.JSON_ENCODER_BACKEND
+    encoder = _json_encoder_cache.get(backend)
+    if encoder is None:
+        encoder = _json_encoder_cache[backend] = _load_json_encoder(backend)
+    return encoder
+
+
+@connect_setting_changed
+def _reset_json_encoder(name):
+    if name is None or name in JSON_ENCODER_SETTINGS:
+        _json_encoder_cache.clear()
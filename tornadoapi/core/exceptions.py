@@ -21,6 +21,9 @@ class CustomError(ValueError):
     def get_res_dict(self):
         return self.code.get_res_dict(**self.kwargs)
 
+    def get_res_json(self):
+        return self.code.get_res_json(**self.kwargs)
+
 
 class ErrorDetail(six.text_type):
     """
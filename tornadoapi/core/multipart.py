@@ -0,0 +1,221 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+import tempfile
+
+from tornado import httputil
+
+from tornadoapi.core import to_binary
+
+
+class MultipartError(ValueError):
+    """
+    multipart/form-data 格式错误
+    """
+
+
+class MultipartSizeError(MultipartError):
+    """
+    multipart/form-data 数据超过大小限制
+    """
+
+
+class StreamedFile(object):
+    """
+    流式上传的文件，可以像文件一样 read/seek，文件内容保存在 file 中而不是内存
+
+    :param name: 参数名
+    :param filename: 文件名
+    :param content_type: 文件类型
+    :param file: 保存文件内容的 file-like 对象
+    """
+
+    def __init__(self, name, filename, content_type, file):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.file = file
+        self.size = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.size += len(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __repr__(self):
+        return '<StreamedFile %s: %s (%s)>' % (self.name, self.filename, self.size)
+
+
+def default_file_sink(name, filename, content_type, memory_size=1024 * 1024):
+    """
+    默认文件存储，小于 memory_size 的文件保存在内存中，超过时写入临时文件
+    """
+    return tempfile.SpooledTemporaryFile(max_size=memory_size)
+
+
+class MultipartParser(object):
+    """
+    增量解析 multipart/form-data 请求体，文件内容直接写入 create_file_sink 返回的 file-like 对象
+
+    :param boundary: 分隔符
+    :param create_file_sink: 创建文件存储的函数 (name, filename, content_type) -> file-like
+    :param max_file_size: 单个文件最大字节数，None 为不限制
+    :param max_field_size: 单个非文件参数最大字节数，None 为不限制
+    :param max_header_size: 每段头部最大字节数
+    :param max_parts: 最多段数
+    """
+    STATE_PREAMBLE = 0
+    STATE_DELIMITER = 1
+    STATE_HEADERS = 2
+    STATE_DATA = 3
+    STATE_DONE = 4
+
+    def __init__(self, boundary, create_file_sink=default_file_sink, max_file_size=None, max_field_size=None,
+                 max_header_size=10 * 1024, max_parts=1000):
+        boundary = to_binary(boundary)
+        if boundary.startswith(b'"') and boundary.endswith(b'"'):
+            boundary = boundary[1:-1]
+        if not boundary:
+            raise MultipartError('multipart/form-data 缺少 boundary')
+        self.delimiter = b'--' + boundary
+        self.part_delimiter = b'\r\n' + self.delimiter
+        self.create_file_sink = create_file_sink
+        self.max_file_size = max_file_size
+        self.max_field_size = max_field_size
+        self.max_header_size = max_header_size
+        self.max_parts = max_parts
+        self.arguments = {}
+        self.files = {}
+        self._buffer = bytearray()
+        self._state = self.STATE_PREAMBLE
+        self._parts = 0
+        self._name = None
+        self._file = None
+        self._value = None
+
+    @classmethod
+    def get_boundary(cls, content_type):
+        """
+        从 Content-Type 中获取 boundary，不是 multipart/form-data 时返回 None
+        """
+        if not content_type or not content_type.startswith('multipart/form-data'):
+            return None
+        for field in content_type.split(';'):
+            k, sep, v = field.strip().partition('=')
+            if k == 'boundary' and v:
+                return v
+        raise MultipartError('multipart/form-data 缺少 boundary')
+
+    def feed(self, chunk):
+        if self._state == self.STATE_DONE:
+            # 结束分隔符之后的数据忽略
+            return
+        self._buffer += chunk
+        while self._state != self.STATE_DONE:
+            if not self._parse_step():
+                break
+
+    def finish(self):
+        if self._state != self.STATE_DONE:
+            raise MultipartError('multipart/form-data 数据不完整')
+
+    def close(self):
+        for files in self.files.values():
+            for f in files:
+                f.close()
+        if self._file is not None:
+            self._file.close()
+
+    def _parse_step(self):
+        buf = self._buffer
+        if self._state == self.STATE_PREAMBLE:
+            index = buf.find(self.delimiter)
+            if index < 0:
+                del buf[:max(0, len(buf) - len(self.delimiter) + 1)]
+                return False
+            del buf[:index + len(self.delimiter)]
+            self._state = self.STATE_DELIMITER
+        elif self._state == self.STATE_DELIMITER:
+            if len(buf) < 2:
+                return False
+            if buf[:2] == b'--':
+                self._state = self.STATE_DONE
+                del buf[:]
+            elif buf[:2] == b'\r\n':
+                del buf[:2]
+                self._state = self.STATE_HEADERS
+            else:
+                raise MultipartError('multipart/form-data 格式错误')
+        elif self._state == self.STATE_HEADERS:
+            index = buf.find(b'\r\n\r\n')
+            if index < 0:
+                if len(buf) > self.max_header_size:
+                    raise MultipartError('multipart/form-data 头部过大')
+                return False
+            if index > self.max_header_size:
+                raise MultipartError('multipart/form-data 头部过大')
+            self._start_part(bytes(buf[:index]))
+            del buf[:index + 4]
+            self._state = self.STATE_DATA
+        else:
+            index = buf.find(self.part_delimiter)
+            if index < 0:
+                keep = len(self.part_delimiter) - 1
+                if len(buf) > keep:
+                    self._write(bytes(buf[:-keep]))
+                    del buf[:-keep]
+                return False
+            self._write(bytes(buf[:index]))
+            del buf[:index + len(self.part_delimiter)]
+            self._end_part()
+            self._state = self.STATE_DELIMITER
+        return True
+
+    def _start_part(self, header_data):
+        self._parts += 1
+        if self._parts > self.max_parts:
+            raise MultipartError('multipart/form-data 段数过多')
+        try:
+            header_text = header_data.decode('utf-8')
+        except UnicodeDecodeError:
+            # 非 UTF-8 编码的文件名等按 latin-1 解码，不会失败
+            header_text = header_data.decode('latin-1')
+        headers = httputil.HTTPHeaders.parse(header_text)
+        disposition, disp_params = httputil._parse_header(headers.get('Content-Disposition', ''))
+        name = disp_params.get('name')
+        if disposition != 'form-data' or not name:
+            raise MultipartError('multipart/form-data 格式错误')
+        self._name = name
+        if disp_params.get('filename'):
+            content_type = headers.get('Content-Type', 'application/unknown')
+            sink = self.create_file_sink(name, disp_params['filename'], content_type)
+            self._file = StreamedFile(name, disp_params['filename'], content_type, sink)
+        else:
+            self._value = bytearray()
+
+    def _write(self, data):
+        if not data:
+            return
+        if self._file is not None:
+            if self.max_file_size is not None and self._file.size + len(data) > self.max_file_size:
+                raise MultipartSizeError('文件 {} 超过大小限制 {}'.format(self._name, self.max_file_size))
+            self._file.write(data)
+        else:
+            if self.max_field_size is not None and len(self._value) + len(data) > self.max_field_size:
+                raise MultipartSizeError('参数 {} 超过大小限制 {}'.format(self._name, self.max_field_size))
+            self._value += data
+
+    def _end_part(self):
+        if self._file is not None:
+            self._file.seek(0)
+            self.files.setdefault(self._name, []).append(self._file)
+        else:
+            self.arguments.setdefault(self._name, []).append(bytes(self._value))
+        self._name = None
+        self._file = None
+        self._value = None
@@ -0,0 +1,98 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+from collections import OrderedDict
+
+from tornadoapi.core.datastructures import LRUCache
+from tornadoapi.core.functional import empty
+
+
+def parse_accept(accept):
+    """
+    解析 Accept 头，返回按优先级排序的 (media_type, q) 列表，q 相同时保持原顺序，忽略 q=0
+
+    parse_accept('text/html;q=0.8, application/json') -> [('application/json', 1.0), ('text/html', 0.8)]
+    """
+    ret = []
+    for index, item in enumerate(accept.split(',')):
+        params = item.split(';')
+        media_type = params[0].strip().lower()
+        if not media_type:
+            continue
+        if '/' not in media_type:
+            if media_type != '*':
+                continue
+            media_type = '*/*'
+        q = 1.0
+        for param in params[1:]:
+            key, sep, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value.strip())
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ret.append((-q, index, media_type))
+    ret.sort()
+    return [(media_type, -q) for q, index, media_type in ret]
+
+
+class ContentNegotiator(object):
+    """
+    根据 Accept 选择返回格式，结果按 Accept 原始字符串缓存在 LRU 中
+
+    `*/*` 不选择任何格式，由调用方使用默认格式；`type/*` 选择最先注册的同类型格式；
+    `+json` 这类结构化后缀可单独注册
+
+    :param media_types: (media_type, 格式) 列表，靠前的优先
+    :param cache_size: 缓存数量
+    """
+
+    def __init__(self, media_types=(), cache_size=256):
+        self._media_types = OrderedDict()
+        self._cache = LRUCache(cache_size)
+        for media_type, fmt in media_types:
+            self.register(media_type, fmt)
+
+    def register(self, media_type, fmt):
+        """
+        注册格式，media_type 为 'application/json' 或结构化后缀 '+json'
+        """
+        self._media_types.setdefault(media_type.lower(), fmt)
+        self._cache.clear()
+
+    def negotiate(self, accept):
+        """
+        返回 Accept 对应的格式，没有匹配时返回 None
+        """
+        if not accept:
+            return None
+        fmt = self._cache.get(accept, empty)
+        if fmt is empty:
+            fmt = self._negotiate(accept)
+            self._cache.set(accept, fmt)
+        return fmt
+
+    def _negotiate(self, accept):
+        for media_type, q in parse_accept(accept):
+            fmt = self.match(media_type)
+            if fmt is not None:
+                return fmt
+        return None
+
+    def match(self, media_type):
+        media_types = self._media_types
+        if media_type in media_types:
+            return media_types[media_type]
+        main_type, sep, sub_type = media_type.partition('/')
+        if main_type == '*':
+            return None
+        if sub_type == '*':
+            for registered, fmt in media_types.items():
+                if registered.startswith(main_type + '/'):
+                    return fmt
+            return None
+        suffix_index = sub_type.rfind('+')
+        if suffix_index >= 0:
+            return media_types.get(sub_type[suffix_index:])
+        return None
@@ -9,9 +9,10 @@ from collections import OrderedDict
 import six
 
 from tornadoapi.conf import settings as api_settings
-from tornadoapi.core import to_text, json_loads
+from tornadoapi.core import to_text, json_loads, ObjectDict
 from tornadoapi.core.exceptions import ValidationError
-from tornadoapi.validators import MaxLengthValidator, MinLengthValidator, MaxValueValidator, MinValueValidator
+from tornadoapi.validators import MaxLengthValidator, MinLengthValidator, MaxValueValidator, MinValueValidator, \
+    compile_validator
 
 
 def to_choices_dict(choices):
@@ -97,6 +98,7 @@ class Field(object):
     }
     default_validators = []
     initial = None
+    _validation_plan = None
 
     def __init__(self, description=None, required=None, default=empty, help_text=None, raw_body=False,
                  error_messages=None, validators=None, allow_null=None, *args, **kwargs):
@@ -117,6 +119,11 @@ class Field(object):
         messages.update(error_messages or {})
         self.error_messages = messages
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_validation_plan', None)
+        return state
+
     def get_field_info(self):
         return {
             'description': self.description,
@@ -164,6 +171,7 @@ class Field(object):
     @validators.setter
     def validators(self, validators):
         setattr(self, '_validators', validators)
+        self._validation_plan = None
 
     def get_validators(self):
         return self.default_validators[:]
@@ -202,12 +210,68 @@ class Field(object):
         return False, data
 
     def run_validation(self, data=empty):
-        (is_empty_value, data) = self.validate_empty_values(data)
-        if is_empty_value:
-            return data
-        value = self.to_python(data)
-        self.run_validators(value)
-        return value
+        plan = self._validation_plan
+        if plan is None:
+            plan = self._validation_plan = self.compile_validation()
+        return plan(data)
+
+    def compile_validation(self):
+        """
+        编译校验流程，与 validate_empty_values -> to_python -> run_validators 等价
+
+        非空值跳过 validate_empty_values 调用，set_context 在编译时判断，
+        常用检查器内联比较，校验通过时不创建错误列表。
+        修改 validators 后需重新赋值 validators 属性以重新编译
+        """
+        cls = self.__class__
+        check_empty = cls.validate_empty_values != Field.validate_empty_values
+        validate_empty_values = self.validate_empty_values
+        to_python = self.to_python
+
+        if cls.run_validators != Field.run_validators:
+            checks = (self.run_validators, )
+        else:
+            checks = tuple(self._compile_validator(validator) for validator in self.validators)
+
+        if not checks:
+            check = None
+        elif len(checks) == 1:
+            check = checks[0]
+        else:
+            def check(value):
+                errors = None
+                for validator in checks:
+                    try:
+                        validator(value)
+                    except ValidationError as exc:
+                        if isinstance(exc.detail, dict):
+                            raise
+                        if errors is None:
+                            errors = []
+                        errors.extend(exc.detail)
+                if errors:
+                    raise ValidationError(errors)
+
+        def run_validation(data=empty):
+            if check_empty or data is empty or data is None:
+                (is_empty_value, data) = validate_empty_values(data)
+                if is_empty_value:
+                    return data
+            value = to_python(data)
+            if check is not None:
+                check(value)
+            return value
+
+        return run_validation
+
+    def _compile_validator(self, validator):
+        if not hasattr(validator, 'set_context'):
+            return compile_validator(validator)
+
+        def check(value):
+            validator.set_context(self)
+            validator(value)
+        return check
 
     def run_validators(self, value):
         errors = []
@@ -234,7 +298,7 @@ class Field(object):
 
 class FileField(Field):
     """
-    文件
+    文件，StreamingApiHandler 中为 StreamedFile
 
     :param description: 名称
     :param required: 是否必填
@@ -250,7 +314,8 @@ class FileField(Field):
 
     def to_python(self, data):
         from tornado.httputil import HTTPFile
-        if isinstance(data, HTTPFile):
+        from tornadoapi.core.multipart import StreamedFile
+        if isinstance(data, (HTTPFile, StreamedFile)):
             return data
         else:
             self.fail('invalid')
@@ -351,15 +416,22 @@ class CharField(Field):
                 )
             )
 
-    def run_validation(self, data=empty):
-        # Test for the empty string here so that it does not get validated,
-        # and so that subclasses do not need to handle it explicitly
-        # inside the `to_internal_value()` method.
-        if data == '' or (self.trim_whitespace and six.text_type(data).strip() == ''):
-            if not self.allow_blank:
-                self.fail('blank')
-            return ''
-        return super(CharField, self).run_validation(data)
+    def compile_validation(self):
+        run_validation = super(CharField, self).compile_validation()
+        trim_whitespace = self.trim_whitespace
+        text_type = six.text_type
+
+        def run_blank_validation(data=empty):
+            # Test for the empty string here so that it does not get validated,
+            # and so that subclasses do not need to handle it explicitly
+            # inside the `to_internal_value()` method.
+            if data == '' or (trim_whitespace and text_type(data).strip() == ''):
+                if not self.allow_blank:
+                    self.fail('blank')
+                return ''
+            return run_validation(data)
+
+        return run_blank_validation
 
     def to_python(self, data):
         if isinstance(data, bool) or not isinstance(data, six.string_types + six.integer_types + (float,)):
@@ -818,7 +890,52 @@ class JSONField(Field):
         super(JSONField, self).__init__(*args, **kwargs)
 
     def to_python(self, data):
+        if not isinstance(data, six.string_types + (six.binary_type, )):
+            # 已解析的 JSON 请求体数据
+            return data
         try:
             return json_loads(data)
         except (TypeError, ValueError):
             self.fail('invalid')
+
+
+class SchemaField(Field):
+    """
+    嵌套对象参数，使用 fields 校验对象中的每个 key，可绑定 JSON 请求体中的对象或 JSON 字符串
+
+    :param fields: 子参数，dict 或 (参数名, 参数) 列表
+    :param description: 名称
+    :param required: 是否必填
+    :param default: 默认值
+    :param help_text: 说明
+    :param raw_body: 是否从POST BODY 原始数据获取
+    :param error_messages: 错误信息
+    :param validators: 检查器
+    :param allow_null: 是否允许为None
+    """
+    default_error_messages = {
+        'invalid': '该参数不是有效对象'  # 'Value must be a valid object.'
+    }
+
+    def __init__(self, fields, *args, **kwargs):
+        from tornadoapi.schema import Schema
+        self.schema = fields if isinstance(fields, Schema) else Schema(fields)
+        super(SchemaField, self).__init__(*args, **kwargs)
+
+    def _get_ex_info(self):
+        return ['schema : (%s)' % ','.join(
+            '%s: %s' % (field_name, field.__class__.__name__) for field_name, field in self.schema.fields
+        )]
+
+    def to_python(self, data):
+        if isinstance(data, six.string_types + (six.binary_type, )):
+            try:
+                data = json_loads(data)
+            except (TypeError, ValueError):
+                self.fail('invalid')
+        if not isinstance(data, dict):
+            self.fail('invalid')
+        values, errors = self.schema.validate(data)
+        if errors:
+            raise ValidationError(errors)
+        return ObjectDict(values)
@@ -1,23 +1,38 @@
 # encoding: utf-8
 from __future__ import absolute_import, unicode_literals
 
-import copy
+import hashlib
+import json
+import sys
+import weakref
 from collections import OrderedDict
 
 import six
-from tornado import web
+from six.moves import builtins
+from tornado import gen, httputil, web
 from tornado.routing import PathMatches
 from tornado.web import HTTPError
-from tornadoapi.core import logger_handler, to_text, logger, json_dumps
+from tornadoapi.conf import connect_setting_changed
+from tornadoapi.core import logger_handler, to_text, to_binary, logger
 
 from tornadoapi.core.code import CodeData
+from tornadoapi.core.compress import get_compressor
+from tornadoapi.core.datastructures import ImmutableDict
+from tornadoapi.core.encoder import get_json_encoder
 from tornadoapi.core.err_code import ErrCode
 from tornadoapi.core.exceptions import CustomError, ValidationError
+from tornadoapi.core.multipart import MultipartParser, MultipartError, MultipartSizeError, default_file_sink
 from tornadoapi.core.traceback import ExceptionReporter
+from tornadoapi.core.negotiation import ContentNegotiator
 from tornadoapi.fields import Field, empty, FileField
+from tornadoapi.renderers import API_FORMAT_JSON, API_FORMAT_JSONP, API_FORMAT_PREVIEW, \
+    JSONRenderer, JSONPRenderer, PreviewRenderer, MsgpackRenderer, CBORRenderer  # noqa: F401
+from tornadoapi.schema import Schema
 from tornadoapi.template import get_resource_template_html
 from tornadoapi.template.jinja2_loader import Jinja2TemplateLoader
 
+StopAsyncIteration = getattr(builtins, 'StopAsyncIteration', StopIteration)
+
 
 class BaseHandler(web.RequestHandler):
 
@@ -50,6 +65,22 @@ class BaseHandler(web.RequestHandler):
     def tonadoapi_prepare(self):
         self.__tonadoapi_prepare_user()
 
+    def tonadoapi_finish(self, body, cache=False):
+        """
+        按 settings.RESPONSE_COMPRESSION 压缩后结束请求
+
+        :param cache: 是否缓存压缩结果，用于内容基本不变的页面
+        """
+        compressor = get_compressor()
+        if compressor is not None and body:
+            self.add_header('Vary', 'Accept-Encoding')
+            encoding = compressor.choose(self.request.headers.get('Accept-Encoding'))
+            body = to_binary(body)
+            if encoding is not None and len(body) >= compressor.min_length:
+                body = compressor.compress(body, encoding, cache)
+                self.set_header('Content-Encoding', encoding)
+        self.finish(body)
+
     def data_received(self, chunk):
         pass
 
@@ -124,34 +155,119 @@ class Jinja2TemplateHandler(Jinja2TemplateMixin, BaseHandler):
     pass
 
 
-API_FORMAT_JSON = 'json'
-API_FORMAT_JSONP = 'jsonp'
-API_FORMAT_PREVIEW = 'preview'
+FIELD_SOURCE_ARGUMENT = 'argument'
+FIELD_SOURCE_RAW_BODY = 'raw_body'
+FIELD_SOURCE_FILE = 'file'
+
+
+def get_field_source(field):
+    if isinstance(field, FileField):
+        return FIELD_SOURCE_FILE
+    elif field.raw_body:
+        return FIELD_SOURCE_RAW_BODY
+    return FIELD_SOURCE_ARGUMENT
 
 
+class ApiHandlerMetaclass(type):
+    """
+    在类创建时编译参数列表，请求时无需再遍历 dir(self)
+    """
+
+    def __init__(cls, name, bases, attrs):
+        super(ApiHandlerMetaclass, cls).__init__(name, bases, attrs)
+        cls.tonadoapi_compile_fields()
+
+    def __setattr__(cls, name, value):
+        old_value = getattr(cls, name, None)
+        super(ApiHandlerMetaclass, cls).__setattr__(name, value)
+        if not name.startswith('_tonadoapi_') and (isinstance(value, Field) or isinstance(old_value, Field)):
+            cls.tonadoapi_recompile_fields()
+
+    def __delattr__(cls, name):
+        super(ApiHandlerMetaclass, cls).__delattr__(name)
+        cls.tonadoapi_recompile_fields()
+
+    def tonadoapi_recompile_fields(cls):
+        """
+        重新编译当前类及已创建子类的参数列表
+        """
+        cls.tonadoapi_compile_fields()
+        for subclass in cls.__subclasses__():
+            subclass.tonadoapi_recompile_fields()
+
+    def tonadoapi_compile_fields(cls):
+        fields = []
+        for field_name in dir(cls):
+            field = getattr(cls, field_name, None)
+            if not isinstance(field, Field):
+                continue
+            fields.append((field_name, field, get_field_source(field)))
+        type.__setattr__(cls, '_tonadoapi_fields', tuple(fields))
+        type.__setattr__(cls, '_tonadoapi_field_info', None)
+        type.__setattr__(cls, '_tonadoapi_schema', None)
+
+
+@six.add_metaclass(ApiHandlerMetaclass)
 class ApiHandler(BaseHandler):
     CUSTOM_ERROR_STATUS_CODE = 400
     EXCEPTION_STATUS_CODE = 500
+    # Content-Type 为 application/json 或 +json 时参数从 JSON 格式请求体中对应 key 获取，
+    # 请求体中没有的 key 再从 url 参数获取，其他 Content-Type 按表单参数获取
+    JSON_BODY = False
+    # 解析 JSON 请求体使用的 object_hook，如 ObjectDict，默认为 dict
+    JSON_BODY_OBJECT_HOOK = None
+    # 支持的返回格式，Accept 匹配时靠前的优先，依赖未安装的格式不可用
+    RENDERERS = (JSONRenderer(), JSONPRenderer(), PreviewRenderer(), MsgpackRenderer(), CBORRenderer())
+
+    _tonadoapi_json_body = None
 
     @classmethod
     def tonadoapi_get_class_name(cls):
         return '{}.{}'.format(cls.__module__, cls.__name__)
 
+    @classmethod
+    def tonadoapi_get_fields(cls):
+        """
+        返回 (参数名, 参数, 参数来源) 列表，类创建时已编译
+        """
+        return cls._tonadoapi_fields
+
     @classmethod
     def tonadoapi_field_info(cls):
-        if hasattr(cls, '__tonadoapi_field_info') \
-                and hasattr(cls, '__tonadoapi_class_name') \
-                and cls.tonadoapi_get_class_name() == getattr(cls, '__tonadoapi_class_name'):
-            return copy.deepcopy(getattr(cls, '__tonadoapi_field_info'))
-        field_info = OrderedDict()
-        for field_name in dir(cls):
-            field = getattr(cls, field_name, None)
-            if not isinstance(field, Field):
-                continue
-            field_info[field_name] = field.get_field_info()
-        setattr(cls, '__tonadoapi_field_info', field_info)
-        setattr(cls, '__tonadoapi_field_info', cls.tonadoapi_get_class_name())
-        return copy.deepcopy(field_info)
+        """
+        返回参数说明，按类缓存，返回值只读
+        """
+        field_info = cls.__dict__.get('_tonadoapi_field_info')
+        if field_info is None:
+            field_info = ImmutableDict(
+                (field_name, ImmutableDict(field.get_field_info()))
+                for field_name, field, source in cls._tonadoapi_fields
+            )
+            type.__setattr__(cls, '_tonadoapi_field_info', field_info)
+        return field_info
+
+    @classmethod
+    def tonadoapi_schema(cls):
+        """
+        返回由参数定义生成的 Schema，按类缓存，用于脱离请求校验 dict 数据
+        """
+        schema = cls.__dict__.get('_tonadoapi_schema')
+        if schema is None:
+            schema = Schema.from_handler(cls)
+            type.__setattr__(cls, '_tonadoapi_schema', schema)
+        return schema
+
+    def tonadoapi_get_argument(self, name, default=None):
+        """
+        与 get_argument 结果相同，但只解码最后一个值，不处理同名参数的其余值
+        """
+        values = self.request.arguments.get(name)
+        if not values:
+            return default
+        value = self.decode_argument(values[-1], name=name)
+        if isinstance(value, six.text_type):
+            value = self._remove_control_chars_regex.sub(' ', value)
+        return value.strip()
 
     def get_file_argument(self, name, default=None):
         files = self.request.files.get(name)
@@ -159,28 +275,54 @@ class ApiHandler(BaseHandler):
             return default
         return files[-1]
 
+    def is_json_request(self):
+        content_type = self.request.headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        return content_type == 'application/json' or content_type.endswith('+json')
+
+    def tonadoapi_get_json_body(self):
+        """
+        解析 JSON 请求体，每个请求只解析一次，无请求体或 Content-Type 不是 JSON 时返回空 dict
+        """
+        if self._tonadoapi_json_body is None:
+            body = self.request.body
+            if not body or self.request.method.upper() in ('HEAD', 'GET', 'OPTIONS') or not self.is_json_request():
+                json_body = {}
+            else:
+                if six.PY3 and sys.version_info < (3, 6):
+                    body = to_text(body)
+                try:
+                    json_body = json.loads(body, object_hook=self.JSON_BODY_OBJECT_HOOK)
+                except ValueError:
+                    raise CustomError(ErrCode.ERR_COMMON_BAD_FORMAT)
+                if not isinstance(json_body, dict):
+                    raise CustomError(ErrCode.ERR_COMMON_BAD_FORMAT)
+            self._tonadoapi_json_body = json_body
+        return self._tonadoapi_json_body
+
     def tonadoapi_prepare(self):
-        self.tonadoapi_field_info()
         super(ApiHandler, self).tonadoapi_prepare()
+        self.tonadoapi_validate_fields()
+
+    def tonadoapi_validate_fields(self):
         errors = {}
-        for field_name in dir(self):
-            field = getattr(self, field_name, None)
-            if not isinstance(field, Field):
-                continue
-            if isinstance(field, FileField):
+        json_body = self.tonadoapi_get_json_body() if self.JSON_BODY else None
+        for field_name, field, source in self._tonadoapi_fields:
+            if source == FIELD_SOURCE_FILE:
                 data = self.get_file_argument(field_name, empty)
-            elif field.raw_body:
+            elif source == FIELD_SOURCE_RAW_BODY:
                 if self.request.method.upper() in ('HEAD', 'GET', 'OPTIONS'):
                     data = empty
                 else:
                     data = to_text(self.request.body)
+            elif field_name in self.path_kwargs:
+                data = self.path_kwargs[field_name]
+            elif json_body and field_name in json_body:
+                data = json_body[field_name]
             else:
-                data = self.path_kwargs.get(field_name, self.get_argument(field_name, empty))
+                data = self.tonadoapi_get_argument(field_name, empty)
             try:
                 value = field.run_validation(data)
             except ValidationError as exc:
-                if isinstance(exc.detail, dict):
-                    raise
                 errors[field_name] = exc.detail
             else:
                 setattr(self, field_name, value)
@@ -191,6 +333,23 @@ class ApiHandler(BaseHandler):
     def get_return_sample(cls):
         return ''
 
+    @classmethod
+    def tonadoapi_get_renderers(cls):
+        """
+        返回 (格式名: 返回格式, ContentNegotiator)，按 RENDERERS 缓存
+        """
+        cached = cls.__dict__.get('_tonadoapi_renderers')
+        if cached is None or cached[0] is not cls.RENDERERS:
+            renderers = OrderedDict(
+                (renderer.format, renderer) for renderer in cls.RENDERERS if renderer.is_available()
+            )
+            negotiator = ContentNegotiator(
+                (media_type, renderer.format) for renderer in renderers.values() for media_type in renderer.media_types
+            )
+            cached = (cls.RENDERERS, renderers, negotiator)
+            type.__setattr__(cls, '_tonadoapi_renderers', cached)
+        return cached[1], cached[2]
+
     def get_format(self, params_name="format"):
         _format = self.get_argument(params_name, None)
         if not _format:
@@ -198,55 +357,100 @@ class ApiHandler(BaseHandler):
             if xhr == 'XMLHttpRequest':
                 _format = API_FORMAT_JSON
             else:
-                accept = self.request.headers.get('Accept')
-                if accept:
-                    if 'javascript' in accept.lower():
-                        _format = API_FORMAT_JSONP
-                    elif 'json' in accept.lower():
-                        _format = API_FORMAT_JSON
+                renderers, negotiator = self.tonadoapi_get_renderers()
+                _format = negotiator.negotiate(self.request.headers.get('Accept'))
         else:
             _format = _format.lower()
         return _format or (API_FORMAT_PREVIEW if self.debug else API_FORMAT_JSON)
 
-    def write_api(self, obj, no_fail=False, fmt=None, **kwargs):
+    @staticmethod
+    def tonadoapi_get_res_dict(obj):
         if isinstance(obj, (CustomError, CodeData)):
-            obj = obj.get_res_dict()
-        elif not isinstance(obj, dict) or CodeData.get_code_tag() not in obj:
-            obj = ErrCode.SUCCESS.get_res_dict(**{CodeData.get_data_tag(): obj})
+            return obj.get_res_dict()
+        envelope = CodeData.get_envelope()
+        if not isinstance(obj, dict) or envelope.code_tag not in obj:
+            return ErrCode.SUCCESS.get_res_dict(**{envelope.data_tag: obj})
+        return obj
+
+    @staticmethod
+    def tonadoapi_get_res_json(obj):
+        """
+        返回与 tonadoapi_get_res_dict 对应的 json bytes，错误码的固定部分使用预生成的结果
+        """
+        if isinstance(obj, (CustomError, CodeData)):
+            return obj.get_res_json()
+        envelope = CodeData.get_envelope()
+        if not isinstance(obj, dict) or envelope.code_tag not in obj:
+            return ErrCode.SUCCESS.get_res_json(**{envelope.data_tag: obj})
+        return to_binary(get_json_encoder()(obj))
+
+    def write_api(self, obj, no_fail=False, fmt=None, **kwargs):
         if not fmt:
             fmt = self.get_format()
-        support_format = (API_FORMAT_JSON, API_FORMAT_JSONP, API_FORMAT_PREVIEW)
-        if not self.debug:
-            support_format = (API_FORMAT_JSON, API_FORMAT_JSONP)
-
-        if fmt not in support_format and no_fail:
-            fmt = API_FORMAT_JSON
-        if fmt == API_FORMAT_PREVIEW and self.debug:
-            html = get_resource_template_html(
-                'apiview.html',
-                namespace=self.get_template_namespace(),
-                res_data=obj,
-                field_info=self.tonadoapi_field_info(),
-                handler_name=self.get_handler_name(),
-                url=self.request.uri,
-                method=self.request.method,
-                return_sample=self.get_return_sample(),
-                description=self.get_handler_description(),
-                remark=self.get_handler_remark(),
-                support_methods=self.support_methods()
-            )
-            self.set_header("Content-Type", "text/html; charset=UTF-8")
-            self.finish(html)
-        elif fmt == API_FORMAT_JSON:
-            self.set_header("Content-Type", "application/json; charset=UTF-8")
-            self.finish(json_dumps(obj))
-        elif fmt == API_FORMAT_JSONP:
-            self.set_header("Content-Type", "application/javascript")
-            callback = self.get_argument('callback', 'callback')
-            self.finish('%s(%s);' % (callback, json_dumps(obj)))
-        else:
+        renderers, negotiator = self.tonadoapi_get_renderers()
+        renderer = renderers.get(fmt)
+        if renderer is not None and renderer.debug_only and not self.debug:
+            renderer = None
+        if renderer is None and no_fail:
+            renderer = renderers[API_FORMAT_JSON]
+        if renderer is None:
             self.log.error("format error %s" % fmt)
             raise CustomError(ErrCode.ERR_COMMON_BAD_PARAM)
+        body = renderer.render(self, obj)
+        self.set_header("Content-Type", renderer.content_type)
+        self.tonadoapi_finish(body)
+
+    @gen.coroutine
+    def write_api_stream(self, iterable, batch_size=1000, ndjson=False):
+        """
+        流式返回列表数据，每 batch_size 条写入并 flush 一次，等待数据发送后再继续读取，
+        返回格式与 write_api(list(iterable)) 的 json 相同
+
+        :param iterable: 数据，支持迭代器与异步迭代器
+        :param batch_size: 每次写入条数
+        :param ndjson: 是否使用 NDJSON 格式，每行一条数据，不包含 code message
+        """
+        encoder = get_json_encoder()
+        # 列表分隔符与当前 json 后端一致，如 json 为 ', '，orjson 为 ','
+        separator = b'\n' if ndjson else to_binary(encoder([0, 0]))[2:-2]
+        if ndjson:
+            self.set_header("Content-Type", "application/x-ndjson")
+            suffix = b''
+        else:
+            self.set_header("Content-Type", "application/json; charset=UTF-8")
+            prefix, suffix = ErrCode.SUCCESS.get_res_json_parts()
+            self.write(prefix + b'[')
+            suffix = b']' + suffix
+
+        is_async = hasattr(iterable, '__aiter__')
+        iterator = iterable.__aiter__() if is_async else iter(iterable)
+        batch = []
+        count = 0
+        while True:
+            try:
+                if is_async:
+                    item = yield iterator.__anext__()
+                else:
+                    item = next(iterator)
+            except (StopIteration, StopAsyncIteration):
+                break
+            batch.append(to_binary(encoder(item)))
+            if len(batch) >= batch_size:
+                yield self._write_stream_batch(batch, count, separator, ndjson)
+                count += len(batch)
+                batch = []
+        if batch:
+            yield self._write_stream_batch(batch, count, separator, ndjson)
+        self.finish(suffix)
+
+    def _write_stream_batch(self, batch, count, separator, ndjson):
+        if ndjson:
+            self.write(separator.join(batch) + separator)
+        else:
+            if count:
+                self.write(separator)
+            self.write(separator.join(batch))
+        return self.flush()
 
     def log_exception(self, typ, value, tb):
         if isinstance(value, CustomError):
@@ -293,16 +497,124 @@ class ApiHandler(BaseHandler):
             super(ApiHandler, self).write_error(status_code, **kwargs)
 
 
+@web.stream_request_body
+class StreamingApiHandler(ApiHandler):
+    """
+    流式接收请求体的 ApiHandler，multipart/form-data 请求增量解析，
+    文件内容写入 create_file_sink 返回的 file-like 对象，FileField 获取到的是 StreamedFile。
+    参数校验在请求体接收完成后、调用 get/post 等方法前执行
+    """
+    # 请求体最大字节数，None 使用 tornado 的 max_body_size
+    STREAM_MAX_BODY_SIZE = None
+    # 单个文件最大字节数，None 为不限制
+    STREAM_MAX_FILE_SIZE = None
+    # 单个非文件参数最大字节数
+    STREAM_MAX_FIELD_SIZE = 1024 * 1024
+    # 文件小于该字节数时保存在内存中，超过时写入临时文件
+    STREAM_FILE_MEMORY_SIZE = 1024 * 1024
+
+    _tonadoapi_stream_parser = None
+    _tonadoapi_stream_error = None
+
+    def tonadoapi_prepare(self):
+        if self.STREAM_MAX_BODY_SIZE is not None:
+            self.request.connection.set_max_body_size(self.STREAM_MAX_BODY_SIZE)
+        super(ApiHandler, self).tonadoapi_prepare()
+        self._tonadoapi_body_chunks = []
+        try:
+            boundary = MultipartParser.get_boundary(self.request.headers.get('Content-Type', ''))
+            if boundary is not None:
+                self._tonadoapi_stream_parser = MultipartParser(
+                    boundary, self.create_file_sink, self.STREAM_MAX_FILE_SIZE, self.STREAM_MAX_FIELD_SIZE
+                )
+        except MultipartError as e:
+            self._tonadoapi_stream_error = e
+
+        method_name = self.request.method.lower()
+        method = getattr(self, method_name)
+
+        def stream_method(*args, **kwargs):
+            self.tonadoapi_finish_stream()
+            self.tonadoapi_validate_fields()
+            return method(*args, **kwargs)
+        setattr(self, method_name, stream_method)
+
+    def create_file_sink(self, name, filename, content_type):
+        """
+        重写修改文件存储方式，返回可写入的 file-like 对象，请求结束时会被 close
+        """
+        return default_file_sink(name, filename, content_type, self.STREAM_FILE_MEMORY_SIZE)
+
+    def data_received(self, chunk):
+        if self._tonadoapi_stream_error is not None:
+            return
+        if self._tonadoapi_stream_parser is None:
+            self._tonadoapi_body_chunks.append(chunk)
+            return
+        try:
+            self._tonadoapi_stream_parser.feed(chunk)
+        except MultipartError as e:
+            self._tonadoapi_stream_error = e
+
+    def tonadoapi_finish_stream(self):
+        request = self.request
+        parser = self._tonadoapi_stream_parser
+        if self._tonadoapi_stream_error is None:
+            try:
+                if parser is not None:
+                    parser.finish()
+                    request.files.update(parser.files)
+                    for name, values in parser.arguments.items():
+                        request.body_arguments.setdefault(name, []).extend(values)
+                else:
+                    request.body = b''.join(self._tonadoapi_body_chunks)
+                    self._tonadoapi_body_chunks = []
+                    httputil.parse_body_arguments(
+                        request.headers.get('Content-Type', ''), request.body,
+                        request.body_arguments, request.files, request.headers
+                    )
+            except MultipartError as e:
+                self._tonadoapi_stream_error = e
+        if self._tonadoapi_stream_error is not None:
+            if isinstance(self._tonadoapi_stream_error, MultipartSizeError):
+                raise CustomError(
+                    ErrCode.ERR_COMMON_BAD_PARAM, status_code=413, message=to_text(self._tonadoapi_stream_error)
+                )
+            raise CustomError(ErrCode.ERR_COMMON_BAD_FORMAT, message=to_text(self._tonadoapi_stream_error))
+        for name, values in request.body_arguments.items():
+            request.arguments.setdefault(name, []).extend(values)
+
+    def tonadoapi_close_stream(self):
+        if self._tonadoapi_stream_parser is not None:
+            self._tonadoapi_stream_parser.close()
+
+    def on_finish(self):
+        self.tonadoapi_close_stream()
+        super(StreamingApiHandler, self).on_finish()
+
+    def on_connection_close(self):
+        self.tonadoapi_close_stream()
+        super(StreamingApiHandler, self).on_connection_close()
+
+
 class NotFoundHandler(BaseHandler):
     def prepare(self):
         raise web.HTTPError(404)
 
 
 class ApiDocHandler(BaseHandler):
+    """
+    接口文档，页面按 application 缓存，路由变化时重新生成，支持 ETag/304
+    """
+    _tonadoapi_doc_cache = weakref.WeakKeyDictionary()
 
-    def get(self, *args, **kwargs):
+    @classmethod
+    def tonadoapi_clear_doc_cache(cls):
+        cls._tonadoapi_doc_cache.clear()
+
+    def get_api_list(self, rules):
         api_list = list()
-        for rule in self.application.wildcard_router.rules:
+        for rule in rules:
             if not issubclass(rule.target, ApiHandler):
                 continue
             data = {
@@ -314,17 +626,48 @@ class ApiDocHandler(BaseHandler):
                 'return_sample': rule.target.get_return_sample()
             }
             api_list.append(data)
+        return api_list
+
+    def render_doc(self, rules):
         ret_sample = {
             CodeData.get_code_tag(): '错误码',
             CodeData.get_message_tag(): '错误描述',
             CodeData.get_data_tag(): '数据'
         }
-        html = get_resource_template_html(
+        return get_resource_template_html(
             'doc.html',
             namespace=self.get_template_namespace(),
             err_codes=[getattr(ErrCode, tag) for tag in ErrCode.get_tags()],
             ret_sample_data=ret_sample,
-            api_list=api_list,
+            api_list=self.get_api_list(rules),
         )
+
+    def get_doc(self):
+        """
+        返回 (html, etag)，路由未变化时使用缓存
+        """
+        rules = tuple(self.application.wildcard_router.rules)
+        app_cache = self._tonadoapi_doc_cache.setdefault(self.application, {})
+        cached = app_cache.get(type(self))
+        if cached is None or cached[0] != rules:
+            html = to_binary(self.render_doc(rules))
+            # 压缩后内容不同，使用弱 ETag
+            etag = 'W/"%s"' % hashlib.sha1(html).hexdigest()
+            cached = app_cache[type(self)] = (rules, html, etag)
+        return cached[1], cached[2]
+
+    def get(self, *args, **kwargs):
+        html, etag = self.get_doc()
         self.set_header("Content-Type", "text/html; charset=UTF-8")
-        self.finish(html)
+        self.set_header("Etag", etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return
+        self.tonadoapi_finish(html, cache=True)
+
+
+@connect_setting_changed
+def _reset_doc_cache(name):
+    if name is None or name in ('RESPONSE_CODE_TAG', 'RESPONSE_MESSAGE_TAG', 'RESPONSE_DATA_TAG'):
+        ApiDocHandler.tonadoapi_clear_doc_cache()
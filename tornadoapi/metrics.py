@@ -0,0 +1,85 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+from tornadoapi.core import json_dumps, to_binary
+from tornadoapi.handler import BaseHandler
+from tornadoapi.storage.stats import get_cache_stats
+
+METRICS_FORMAT_PROMETHEUS = 'prometheus'
+METRICS_FORMAT_JSON = 'json'
+
+# (统计名, 指标名, 说明)
+CACHE_COUNTERS = (
+    ('hits', 'hits_total', 'Cache hits'),
+    ('misses', 'misses_total', 'Cache misses'),
+    ('sets', 'sets_total', 'Cache writes'),
+    ('deletes', 'deletes_total', 'Cache deletes'),
+    ('evictions', 'evictions_total', 'Cache evictions'),
+    ('bytes_read', 'read_bytes_total', 'Estimated bytes read from cache'),
+    ('bytes_written', 'written_bytes_total', 'Estimated bytes written to cache'),
+)
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape_label('%s' % value)) for name, value in labels)
+
+
+def format_prometheus(cache_stats, namespace='tornadoapi_cache'):
+    """
+    将 get_cache_stats 的结果转换为 Prometheus 文本格式，按 prefix、item 输出
+    """
+    items = []
+    for prefix, prefix_stats in sorted(cache_stats.items()):
+        for name, item_stats in sorted(prefix_stats['items'].items()):
+            items.append(([('prefix', prefix), ('item', name)], item_stats))
+
+    lines = []
+    for stat_name, metric_name, description in CACHE_COUNTERS:
+        metric_name = '%s_%s' % (namespace, metric_name)
+        lines.append('# HELP %s %s' % (metric_name, description))
+        lines.append('# TYPE %s counter' % metric_name)
+        for labels, item_stats in items:
+            lines.append('%s%s %s' % (metric_name, _format_labels(labels), item_stats[stat_name]))
+
+    metric_name = '%s_latency_seconds' % namespace
+    lines.append('# HELP %s Cache storage latency' % metric_name)
+    lines.append('# TYPE %s histogram' % metric_name)
+    for labels, item_stats in items:
+        for op, histogram in sorted(item_stats['latency'].items()):
+            op_labels = labels + [('op', op)]
+            for le, count in histogram['buckets']:
+                lines.append('%s_bucket%s %s' % (metric_name, _format_labels(op_labels + [('le', le)]), count))
+            lines.append('%s_sum%s %r' % (metric_name, _format_labels(op_labels), histogram['sum']))
+            lines.append('%s_count%s %s' % (metric_name, _format_labels(op_labels), histogram['count']))
+    return '\n'.join(lines) + '\n'
+
+
+class CacheMetricsHandler(BaseHandler):
+    """
+    缓存统计，需开启 settings.CACHE_STATS，默认返回 Prometheus 文本格式，请求参数 format=json 时返回 json
+
+    ::
+
+        (r'/metrics', CacheMetricsHandler)
+    """
+    content_types = {
+        METRICS_FORMAT_PROMETHEUS: 'text/plain; version=0.0.4; charset=UTF-8',
+        METRICS_FORMAT_JSON: 'application/json; charset=UTF-8',
+    }
+
+    def get(self, *args, **kwargs):
+        fmt = self.get_argument('format', METRICS_FORMAT_PROMETHEUS).lower()
+        if fmt not in self.content_types:
+            fmt = METRICS_FORMAT_PROMETHEUS
+        cache_stats = get_cache_stats()
+        if fmt == METRICS_FORMAT_JSON:
+            content = json_dumps(cache_stats, ensure_ascii=False)
+        else:
+            content = format_prometheus(cache_stats)
+        self.set_header('Content-Type', self.content_types[fmt])
+        self.set_header('Cache-Control', 'no-cache')
+        self.tonadoapi_finish(to_binary(content))
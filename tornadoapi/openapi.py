@@ -0,0 +1,328 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import weakref
+
+import six
+from tornado.routing import PathMatches
+
+from tornadoapi import fields
+from tornadoapi.conf import connect_setting_changed
+from tornadoapi.core import json_dumps, json_loads, to_binary
+from tornadoapi.core.code import CodeData
+from tornadoapi.handler import ApiHandler, BaseHandler, FIELD_SOURCE_FILE, FIELD_SOURCE_RAW_BODY
+
+OPENAPI_VERSION = '3.0.3'
+OPENAPI_FORMAT_JSON = 'json'
+OPENAPI_FORMAT_YAML = 'yaml'
+
+BODY_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+class OpenApiGenerator(object):
+    """
+    根据路由及 ApiHandler 中定义的参数生成 OpenAPI 3 文档
+
+    :param title: 文档标题
+    :param version: 接口版本
+    :param description: 文档描述
+    """
+
+    def __init__(self, title='API', version='1.0.0', description=None):
+        self.title = title
+        self.version = version
+        self.description = description
+
+    def get_spec(self, rules):
+        """
+        返回 OpenAPI 文档 dict
+
+        :param rules: Application.wildcard_router.rules
+        """
+        info = {'title': self.title, 'version': self.version}
+        if self.description:
+            info['description'] = self.description
+        paths = {}
+        operation_ids = set()
+        for rule in rules:
+            if not isinstance(rule.target, type) or not issubclass(rule.target, ApiHandler):
+                continue
+            path, path_params = self.get_path(rule)
+            path_item = paths.setdefault(path, {})
+            for method in rule.target.support_methods():
+                if method == 'HEAD' and 'get' in path_item:
+                    continue
+                operation = self.get_operation(rule, method, path_params)
+                operation_id = operation['operationId']
+                index = 1
+                while operation['operationId'] in operation_ids:
+                    index += 1
+                    operation['operationId'] = '%s_%d' % (operation_id, index)
+                operation_ids.add(operation['operationId'])
+                path_item[method.lower()] = operation
+        return {'openapi': OPENAPI_VERSION, 'info': info, 'paths': paths}
+
+    def get_path(self, rule):
+        """
+        返回 (OpenAPI 路径, 路径参数名列表)，无法转换的正则原样返回
+        """
+        matcher = rule.matcher
+        if not isinstance(matcher, PathMatches):
+            return str(matcher), []
+        regex = matcher.regex
+        group_names = dict((index, name) for name, index in regex.groupindex.items())
+        params = [group_names.get(i, 'arg%d' % (i - 1)) for i in range(1, regex.groups + 1)]
+        pieces = matcher._path.split('%s') if matcher._path is not None else None
+        if pieces is None or len(pieces) != len(params) + 1:
+            return regex.pattern.rstrip('$'), []
+        path = pieces[0]
+        for param, piece in zip(params, pieces[1:]):
+            path += '{%s}%s' % (param, piece)
+        return path, params
+
+    def get_operation(self, rule, method, path_params):
+        handler_class = rule.target
+        description = '\n\n'.join(
+            text for text in (handler_class.get_handler_description(), handler_class.get_handler_remark()) if text
+        )
+        operation = {
+            'operationId': '%s.%s' % (handler_class.tonadoapi_get_class_name(), method.lower()),
+            'summary': rule.name or handler_class.get_handler_name(),
+        }
+        if description:
+            operation['description'] = description
+
+        handler_fields = dict((name, (field, source)) for name, field, source in handler_class.tonadoapi_get_fields())
+        parameters = []
+        for name in path_params:
+            field = handler_fields.pop(name, (None, None))[0]
+            parameter = {'name': name, 'in': 'path', 'required': True}
+            parameter['schema'] = self.get_field_schema(field) if field is not None else {'type': 'string'}
+            if field is not None and field.description:
+                parameter['description'] = field.description
+            parameters.append(parameter)
+
+        arguments = []
+        files = []
+        raw_body = None
+        for name, (field, source) in sorted(handler_fields.items()):
+            if source == FIELD_SOURCE_RAW_BODY:
+                raw_body = raw_body or field
+            elif source == FIELD_SOURCE_FILE:
+                files.append((name, field))
+            else:
+                arguments.append((name, field))
+
+        if method in BODY_METHODS and raw_body is None:
+            request_body = self.get_request_body(handler_class, arguments, files)
+        else:
+            parameters.extend(self.get_query_parameter(name, field) for name, field in arguments)
+            request_body = self.get_raw_request_body(raw_body) if method in BODY_METHODS else None
+        if parameters:
+            operation['parameters'] = parameters
+        if request_body is not None:
+            operation['requestBody'] = request_body
+        operation['responses'] = {'200': self.get_response(handler_class)}
+        return operation
+
+    def get_query_parameter(self, name, field):
+        parameter = {'name': name, 'in': 'query', 'required': field.required, 'schema': self.get_field_schema(field)}
+        if field.description:
+            parameter['description'] = field.description
+        if parameter['schema'].get('type') == 'array':
+            parameter['style'] = 'form'
+            parameter['explode'] = False
+        return parameter
+
+    def get_request_body(self, handler_class, arguments, files):
+        if not arguments and not files:
+            return None
+        schema = self.get_object_schema(arguments + files)
+        if files:
+            content = {'multipart/form-data': {'schema': schema}}
+        elif handler_class.JSON_BODY:
+            # 表单中的嵌套参数无法用同一 schema 描述，只声明 JSON 格式
+            content = {'application/json': {'schema': schema}}
+        else:
+            content = {'application/x-www-form-urlencoded': {'schema': schema}}
+        return {'required': bool(schema.get('required')), 'content': content}
+
+    def get_raw_request_body(self, field):
+        if field is None:
+            return None
+        schema = self.get_field_schema(field)
+        if isinstance(field, (fields.JSONField, fields.SchemaField)):
+            content_type = 'application/json'
+        else:
+            content_type = 'text/plain'
+        request_body = {'required': field.required, 'content': {content_type: {'schema': schema}}}
+        if field.description:
+            request_body['description'] = field.description
+        return request_body
+
+    def get_response(self, handler_class):
+        data_schema = {}
+        return_sample = handler_class.get_return_sample()
+        if return_sample:
+            data_schema['example'] = return_sample
+        return {
+            'description': '成功时 {code} 为 0'.format(code=CodeData.get_code_tag()),
+            'content': {
+                'application/json': {
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            CodeData.get_code_tag(): {'type': 'integer', 'description': '错误码'},
+                            CodeData.get_message_tag(): {'type': 'string', 'description': '错误描述'},
+                            CodeData.get_data_tag(): data_schema,
+                        }
+                    }
+                }
+            }
+        }
+
+    def get_object_schema(self, field_items):
+        properties = {}
+        required = []
+        for name, field in field_items:
+            properties[name] = self.get_field_schema(field)
+            if field.required:
+                required.append(name)
+        schema = {'type': 'object', 'properties': properties}
+        if required:
+            schema['required'] = required
+        return schema
+
+    def get_field_schema(self, field):
+        """
+        返回参数对应的 OpenAPI schema
+        """
+        schema = self.get_field_type_schema(field)
+        if field.description:
+            schema['title'] = field.description
+        if field.help_text:
+            schema['description'] = field.help_text
+        if field.allow_null:
+            schema['nullable'] = True
+        if field.default is not fields.empty and field.default is not None:
+            try:
+                schema['default'] = json_loads(json_dumps(field.default), object_hook=None)
+            except (TypeError, ValueError):
+                pass
+        return schema
+
+    def get_field_type_schema(self, field):
+        if isinstance(field, fields.FileField):
+            return {'type': 'string', 'format': 'binary'}
+        if isinstance(field, fields.BooleanField):
+            return {'type': 'boolean'}
+        if isinstance(field, fields.ChoiceField):
+            choices = list(field.choices.keys())
+            schema = {'enum': choices}
+            if choices and all(isinstance(c, six.integer_types) and not isinstance(c, bool) for c in choices):
+                schema['type'] = 'integer'
+            elif all(isinstance(c, six.string_types) for c in choices):
+                schema['type'] = 'string'
+            return schema
+        if isinstance(field, fields.NumberField):
+            if isinstance(field, fields.IntegerField):
+                schema = {'type': 'integer'}
+            elif isinstance(field, fields.FloatField):
+                schema = {'type': 'number', 'format': 'float'}
+            else:
+                schema = {'type': 'number'}
+            if field.max_value is not None:
+                schema['maximum'] = field.max_value
+            if field.min_value is not None:
+                schema['minimum'] = field.min_value
+            return schema
+        if isinstance(field, fields.DateField):
+            return {'type': 'string', 'format': 'date'}
+        if isinstance(field, fields.TimeField):
+            return {'type': 'string', 'format': 'time'}
+        if isinstance(field, fields.DateTimeField):
+            return {'type': 'string', 'format': 'date-time'}
+        if isinstance(field, fields.SplitCharField) and field.sep == ',':
+            return {'type': 'array', 'items': self.get_field_type_schema(field.field)}
+        if isinstance(field, fields.CharField):
+            schema = {'type': 'string'}
+            if field.max_length is not None:
+                schema['maxLength'] = field.max_length
+            if field.min_length is not None:
+                schema['minLength'] = field.min_length
+            return schema
+        if isinstance(field, fields.SchemaField):
+            return self.get_object_schema(field.schema.fields)
+        if isinstance(field, fields.JSONField):
+            return {}
+        return {'type': 'string'}
+
+
+def dumps_openapi(spec, fmt=OPENAPI_FORMAT_JSON):
+    """
+    返回 OpenAPI 文档 bytes，yaml 格式需安装 PyYAML
+    """
+    if fmt == OPENAPI_FORMAT_YAML:
+        import yaml
+        return to_binary(yaml.safe_dump(spec, allow_unicode=True, default_flow_style=False))
+    return to_binary(json_dumps(spec, indent=2, ensure_ascii=False))
+
+
+class OpenApiHandler(BaseHandler):
+    """
+    OpenAPI 文档，按 application 缓存，路由变化时重新生成，支持 ETag/304
+
+    请求参数 format=yaml 时返回 yaml
+
+    ::
+
+        (r'/openapi.json', OpenApiHandler, {'title': 'My API', 'version': '1.0.0'})
+    """
+    generator_class = OpenApiGenerator
+    content_types = {
+        OPENAPI_FORMAT_JSON: 'application/json; charset=UTF-8',
+        OPENAPI_FORMAT_YAML: 'application/yaml; charset=UTF-8',
+    }
+    _tonadoapi_openapi_cache = weakref.WeakKeyDictionary()
+
+    def initialize(self, title='API', version='1.0.0', description=None):
+        self.generator = self.generator_class(title, version, description)
+
+    @classmethod
+    def tonadoapi_clear_openapi_cache(cls):
+        cls._tonadoapi_openapi_cache.clear()
+
+    def get_openapi(self, fmt):
+        """
+        返回 (文档内容, etag)，路由未变化时使用缓存
+        """
+        rules = tuple(self.application.wildcard_router.rules)
+        generator = self.generator
+        key = (type(self), generator.title, generator.version, generator.description, fmt)
+        app_cache = self._tonadoapi_openapi_cache.setdefault(self.application, {})
+        cached = app_cache.get(key)
+        if cached is None or cached[0] != rules:
+            content = dumps_openapi(generator.get_spec(rules), fmt)
+            etag = 'W/"%s"' % hashlib.sha1(content).hexdigest()
+            cached = app_cache[key] = (rules, content, etag)
+        return cached[1], cached[2]
+
+    def get(self, *args, **kwargs):
+        fmt = self.get_argument('format', OPENAPI_FORMAT_JSON).lower()
+        if fmt not in self.content_types:
+            fmt = OPENAPI_FORMAT_JSON
+        content, etag = self.get_openapi(fmt)
+        self.set_header('Content-Type', self.content_types[fmt])
+        self.set_header('Etag', etag)
+        if self.check_etag_header():
+            self.set_status(304)
+            self.finish()
+            return
+        self.tonadoapi_finish(content, cache=True)
+
+
+@connect_setting_changed
+def _reset_openapi_cache(name):
+    if name is None or name in ('RESPONSE_CODE_TAG', 'RESPONSE_MESSAGE_TAG', 'RESPONSE_DATA_TAG'):
+        OpenApiHandler.tonadoapi_clear_openapi_cache()
@@ -0,0 +1,61 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+import argparse
+import os
+import sys
+
+from tornado.web import Application
+
+from tornadoapi.conf import ENVIRONMENT_VARIABLE, settings
+from tornadoapi.core.module_loading import import_string
+
+
+def load_application(dotted_path):
+    """
+    加载 Application，dotted_path 可以是 Application、路由列表或返回 Application 的函数
+    """
+    app = import_string(dotted_path)
+    if not isinstance(app, (Application, list, tuple)) and callable(app):
+        app = app()
+    if isinstance(app, (list, tuple)):
+        app = Application(app)
+    return app
+
+
+def main(argv=None):
+    """
+    命令行生成 OpenAPI 文档
+
+    tornadoapi-openapi myproject.app.make_app --format yaml --output openapi.yaml
+    """
+    parser = argparse.ArgumentParser(description='Generate OpenAPI 3 document from tornadoapi handlers')
+    parser.add_argument('application', help='dotted path to Application, rule list or function returning Application')
+    parser.add_argument('--format', choices=('json', 'yaml'), default='json')
+    parser.add_argument('--output', '-o', help='output file, default stdout')
+    parser.add_argument('--title', default='API')
+    parser.add_argument('--version', default='1.0.0')
+    parser.add_argument('--description', default=None)
+    parser.add_argument('--settings', help='settings module, default %s' % ENVIRONMENT_VARIABLE)
+    args = parser.parse_args(argv)
+
+    if args.settings:
+        os.environ[ENVIRONMENT_VARIABLE] = args.settings
+    if not settings.configured and not os.environ.get(ENVIRONMENT_VARIABLE):
+        settings.configure()
+    sys.path.insert(0, os.getcwd())
+    # 导入 handler 前需要先配置 settings
+    from tornadoapi.openapi import OpenApiGenerator, dumps_openapi
+    app = load_application(args.application)
+    spec = OpenApiGenerator(args.title, args.version, args.description).get_spec(app.wildcard_router.rules)
+    content = dumps_openapi(spec, args.format)
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(content)
+    else:
+        out = getattr(sys.stdout, 'buffer', sys.stdout)
+        out.write(content + b'\n')
+
+
+if __name__ == '__main__':
+    main()
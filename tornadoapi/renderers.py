@@ -0,0 +1,129 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+import datetime
+import decimal
+import uuid
+
+from tornadoapi.core import to_binary, get_json_default
+from tornadoapi.template import get_resource_template_html
+
+API_FORMAT_JSON = 'json'
+API_FORMAT_JSONP = 'jsonp'
+API_FORMAT_PREVIEW = 'preview'
+API_FORMAT_MSGPACK = 'msgpack'
+API_FORMAT_CBOR = 'cbor'
+
+
+class BaseRenderer(object):
+    """
+    ApiHandler 返回格式
+
+    :param format: 格式名，对应请求参数 format
+    :param media_types: Accept 中对应该格式的 media type
+    :param content_type: 返回的 Content-Type
+    :param debug_only: 是否只在 debug 模式可用
+    :param requirement: 依赖的模块，未安装时该格式不可用
+    """
+    format = None
+    media_types = ()
+    content_type = None
+    debug_only = False
+    requirement = None
+    _available = None
+
+    def is_available(self):
+        if self.requirement is None:
+            return True
+        if self._available is None:
+            try:
+                __import__(self.requirement)
+                self._available = True
+            except ImportError:
+                self._available = False
+        return self._available
+
+    def render(self, handler, obj):
+        """
+        返回 obj 对应的返回内容
+        """
+        raise NotImplementedError()
+
+
+class JSONRenderer(BaseRenderer):
+    format = API_FORMAT_JSON
+    media_types = ('application/json', 'text/json', '+json')
+    content_type = 'application/json; charset=UTF-8'
+
+    def render(self, handler, obj):
+        return handler.tonadoapi_get_res_json(obj)
+
+
+class JSONPRenderer(BaseRenderer):
+    format = API_FORMAT_JSONP
+    media_types = ('application/javascript', 'text/javascript', 'application/x-javascript')
+    content_type = 'application/javascript'
+
+    def render(self, handler, obj):
+        callback = handler.get_argument('callback', 'callback')
+        return b''.join((to_binary(callback), b'(', handler.tonadoapi_get_res_json(obj), b');'))
+
+
+class PreviewRenderer(BaseRenderer):
+    format = API_FORMAT_PREVIEW
+    content_type = 'text/html; charset=UTF-8'
+    debug_only = True
+
+    def render(self, handler, obj):
+        return get_resource_template_html(
+            'apiview.html',
+            namespace=handler.get_template_namespace(),
+            res_data=handler.tonadoapi_get_res_dict(obj),
+            field_info=handler.tonadoapi_field_info(),
+            handler_name=handler.get_handler_name(),
+            url=handler.request.uri,
+            method=handler.request.method,
+            return_sample=handler.get_return_sample(),
+            description=handler.get_handler_description(),
+            remark=handler.get_handler_remark(),
+            support_methods=handler.support_methods()
+        )
+
+
+class MsgpackRenderer(BaseRenderer):
+    """
+    MessagePack 格式，时间日期、Decimal、UUID 格式与 json 一致，需安装 msgpack
+    """
+    format = API_FORMAT_MSGPACK
+    media_types = ('application/msgpack', 'application/x-msgpack', '+msgpack')
+    content_type = 'application/msgpack'
+    requirement = 'msgpack'
+
+    def render(self, handler, obj):
+        import msgpack
+        return msgpack.packb(handler.tonadoapi_get_res_dict(obj), default=get_json_default(), use_bin_type=True)
+
+
+class CBORRenderer(BaseRenderer):
+    """
+    CBOR 格式，时间日期、Decimal、UUID 格式与 json 一致，需安装 cbor2
+    """
+    format = API_FORMAT_CBOR
+    media_types = ('application/cbor', '+cbor')
+    content_type = 'application/cbor'
+    requirement = 'cbor2'
+    # cbor2 原生支持这些类型，需要覆盖为与 json 一致的字符串
+    override_types = (datetime.datetime, datetime.date, datetime.time, decimal.Decimal, uuid.UUID)
+    _encoders = (None, None)
+
+    def get_encoders(self):
+        json_default = get_json_default()
+        if self._encoders[0] is not json_default:
+            def encode(encoder, value):
+                encoder.encode(json_default(value))
+            self._encoders = (json_default, dict((cls, encode) for cls in self.override_types))
+        return self._encoders[1]
+
+    def render(self, handler, obj):
+        import cbor2
+        return cbor2.dumps(handler.tonadoapi_get_res_dict(obj), encoders=self.get_encoders())
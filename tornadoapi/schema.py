@@ -0,0 +1,71 @@
+# encoding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+from collections import OrderedDict
+
+from tornadoapi.core.exceptions import ValidationError
+from tornadoapi.fields import Field, empty
+
+
+class Schema(object):
+    """
+    参数集合，脱离 Handler 校验普通 dict 数据
+
+    :param fields: 参数，dict 或 (参数名, 参数) 列表
+
+    ::
+
+        schema = Schema.from_handler(MyHandler)
+        values, errors = schema.validate({'test_param': 'abc'})
+        values_list, errors = schema.validate_many(rows)
+    """
+
+    def __init__(self, fields):
+        if isinstance(fields, dict):
+            fields = fields.items()
+        self.fields = tuple(fields)
+        for field_name, field in self.fields:
+            assert isinstance(field, Field), '`%s` is not a Field' % field_name
+
+    @classmethod
+    def from_handler(cls, handler_class):
+        """
+        使用 ApiHandler 中定义的参数创建
+        """
+        return cls((field_name, field) for field_name, field, source in handler_class.tonadoapi_get_fields())
+
+    def get_field_names(self):
+        return [field_name for field_name, field in self.fields]
+
+    def validate(self, data):
+        """
+        校验一条数据
+
+        :param data: dict，不存在的 key 按未传参数处理
+        :return: (校验后数据, 错误信息) 错误信息为 {参数名: 错误列表}，无错误时为空 dict
+        """
+        values = OrderedDict()
+        errors = OrderedDict()
+        for field_name, field in self.fields:
+            try:
+                values[field_name] = field.run_validation(data.get(field_name, empty))
+            except ValidationError as exc:
+                errors[field_name] = exc.detail
+        return values, errors
+
+    def validate_many(self, data_list):
+        """
+        批量校验多条数据
+
+        :param data_list: dict 列表
+        :return: (校验后数据列表, 错误信息) 错误信息为 {序号: {参数名: 错误列表}}，只包含有错误的数据
+        """
+        values_list = []
+        errors = OrderedDict()
+        validate = self.validate
+        for index, data in enumerate(data_list):
+            values, item_errors = validate(data)
+            values_list.append(values)
+            if item_errors:
+                errors[index] = item_errors
+        return values_list, errors
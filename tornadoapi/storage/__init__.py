@@ -1,12 +1,54 @@
 # encoding: utf-8
 from __future__ import absolute_import, unicode_literals
 
+import sys
+
+from tornado import gen
+
+
+def iter_chunks(items, size):
+    """
+    将 items 按 size 分批
+    """
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def estimate_size(value):
+    """
+    估算 value 占用的内存字节数，递归计算 dict/list/tuple/set 中的元素
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v) for v in value)
+    return size
+
 
 class BaseStorage(object):
 
     def mget(self, keys=()):
         return [self.get(key) for key in keys]
 
+    def mset(self, mapping, ttl=None):
+        for key, value in mapping.items():
+            self.set(key, value, ttl)
+
+    def mdelete(self, keys=()):
+        for key in keys:
+            self.delete(key)
+
+    def add(self, key, value, ttl=None):
+        """
+        key 不存在时写入，返回是否写入，默认实现不是原子操作
+        """
+        if value is None or self.get(key) is not None:
+            return False
+        self.set(key, value, ttl)
+        return True
+
     def get(self, key, default=None):
         raise NotImplementedError()
 
@@ -24,3 +66,45 @@ class BaseStorage(object):
 
     def __delitem__(self, key):
         self.delete(key)
+
+
+class AsyncBaseStorage(object):
+    """
+    异步存储，方法返回 Future，在 coroutine 中 yield 或 await 获取结果
+    """
+
+    @gen.coroutine
+    def mget(self, keys=()):
+        ret = yield [self.get(key) for key in keys]
+        raise gen.Return(ret)
+
+    def get(self, key, default=None):
+        raise NotImplementedError()
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    @gen.coroutine
+    def mset(self, mapping, ttl=None):
+        yield [self.set(key, value, ttl) for key, value in mapping.items()]
+
+    @gen.coroutine
+    def mdelete(self, keys=()):
+        yield [self.delete(key) for key in keys]
+
+    @gen.coroutine
+    def add(self, key, value, ttl=None):
+        if value is None:
+            raise gen.Return(False)
+        current = yield self.get(key)
+        if current is not None:
+            raise gen.Return(False)
+        yield self.set(key, value, ttl)
+        raise gen.Return(True)
+
+
+def is_async_storage(storage):
+    return isinstance(storage, AsyncBaseStorage)
@@ -1,21 +1,58 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import functools
+import hashlib
 import inspect
+import math
+import random
+import time
 
-from tornadoapi.storage import BaseStorage
+import six
+from tornado import gen
+from tornado.concurrent import is_future
+
+from tornadoapi.core import json_dumps, logger, to_binary
+from tornadoapi.storage import AsyncBaseStorage, BaseStorage, is_async_storage, stats
+
+# 进程内正在计算的 {key: Future}
+_computing = {}
+# 后台刷新未获得跨进程锁时 _do_compute 的结果
+_NOT_COMPUTED = object()
 
 
 def _is_cache_item(obj):
     return isinstance(obj, CacheItem)
 
 
+def _is_awaitable(obj):
+    return is_future(obj) or (hasattr(inspect, 'isawaitable') and inspect.isawaitable(obj))
+
+
+def _log_refresh_error(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error('Cache refresh error', exc_info=(type(exc), exc, getattr(exc, '__traceback__', None)))
+
+
 class CacheItem(object):
+    """
+    缓存项，storage 为 AsyncBaseStorage 时 get/set/delete/mget 返回 Future
+
+    开启 settings.CACHE_STATS 时记录命中、写入、删除次数，数据大小及存储耗时，通过 get_stats 获取
+    """
+
+    # get_or_compute 提前刷新使用的随机数函数，返回 [0, 1) 的数
+    random_func = staticmethod(random.random)
 
     def __init__(self, cache=None, name=None):
         self.cache = cache
         self.name = name
 
+    @property
+    def is_async(self):
+        return self.cache.is_async
+
     def key_name(self, key):
         if isinstance(key, (tuple, list)):
             key = ':'.join(key)
@@ -27,18 +64,298 @@ class CacheItem(object):
 
     def mget(self, keys=()):
         key_names = [self.key_name(key) for key in keys]
-        return self.cache.storage.mget(key_names)
+        if not stats.is_enabled():
+            return self.cache.storage.mget(key_names)
+        return self._track('mget', lambda s, values: s.record_get(values), self.cache.storage.mget, key_names)
 
     def get(self, key=None, default=None):
-        return self.cache.storage.get(self.key_name(key), default)
+        return self._get(self.key_name(key), default)
 
     def set(self, key=None, value=None, ttl=None):
         if ttl is None:
             ttl = self.cache.ttl
-        return self.cache.storage.set(self.key_name(key), value, ttl)
+        return self._set(self.key_name(key), value, ttl)
 
     def delete(self, key=None):
-        return self.cache.storage.delete(self.key_name(key))
+        key_name = self.key_name(key)
+        if not stats.is_enabled():
+            return self.cache.storage.delete(key_name)
+        return self._track('delete', lambda s, ret: s.record_delete(1), self.cache.storage.delete, key_name)
+
+    def mset(self, mapping, ttl=None):
+        if ttl is None:
+            ttl = self.cache.ttl
+        mapping = dict((self.key_name(key), value) for key, value in mapping.items())
+        if not stats.is_enabled():
+            return self.cache.storage.mset(mapping, ttl)
+        return self._track(
+            'mset', lambda s, ret: s.record_set(mapping.values()), self.cache.storage.mset, mapping, ttl
+        )
+
+    def mdelete(self, keys=()):
+        key_names = [self.key_name(key) for key in keys]
+        if not stats.is_enabled():
+            return self.cache.storage.mdelete(key_names)
+        return self._track(
+            'mdelete', lambda s, ret: s.record_delete(len(key_names)), self.cache.storage.mdelete, key_names
+        )
+
+    def get_stats(self):
+        """
+        返回统计数据，未开启 settings.CACHE_STATS 或没有数据时返回 None
+        """
+        return stats.get_cache_stats(self.cache.prefix).get(self.cache.prefix, {}).get('items', {}).get(self.name)
+
+    def _get(self, key_name, default=None):
+        if not stats.is_enabled():
+            return self.cache.storage.get(key_name, default)
+        return self._track(
+            'get', lambda s, value: s.record_get([None if value is default else value]),
+            self.cache.storage.get, key_name, default
+        )
+
+    def _set(self, key_name, value, ttl):
+        if not stats.is_enabled():
+            return self.cache.storage.set(key_name, value, ttl)
+        return self._track('set', lambda s, ret: s.record_set([value]), self.cache.storage.set, key_name, value, ttl)
+
+    def _track(self, op, record, method, *args):
+        """
+        调用存储方法 method 并记录耗时，完成后调用 record(CacheStats, 返回值)
+        """
+        item_stats = stats.get_item_stats(self.cache.prefix, self.name)
+        start = time.time()
+        ret = method(*args)
+        if not self.is_async:
+            item_stats.observe(op, time.time() - start)
+            record(item_stats, ret)
+            return ret
+
+        def done(future):
+            item_stats.observe(op, time.time() - start)
+            if future.exception() is None:
+                record(item_stats, future.result())
+        # async def 实现的存储返回 coroutine，转换为 Future
+        ret = gen.convert_yielded(ret)
+        ret.add_done_callback(done)
+        return ret
+
+    @gen.coroutine
+    def get_or_compute(self, key=None, producer=None, ttl=None, stale_ttl=0, beta=1.0, lock_ttl=None,
+                       lock_wait=None, lock_interval=0.05):
+        """
+        获取缓存，不存在时调用 producer() 计算并写入缓存，返回 Future
+
+        - 同一进程中同一 key 同时只有一个 producer 在执行，其他请求等待同一结果
+        - 按计算耗时提前刷新（XFetch），快过期时以一定概率在后台重新计算，并返回当前值
+        - 过期后 stale_ttl 秒内返回旧值，同时在后台重新计算
+        - lock_ttl 不为 None 时在存储中加锁，多个进程中只有一个执行 producer，
+          其他进程每 lock_interval 秒检查一次结果，最多等待 lock_wait 秒（默认为 lock_ttl）后自行计算
+
+        缓存中保存的是包含过期时间与计算耗时的 dict，该 key 只能通过 get_or_compute 读取
+
+        :param producer: 计算函数，可以是 coroutine，返回 None 时不写入缓存
+        :param ttl: 缓存时间，默认为 cache.ttl
+        :param stale_ttl: 过期后可继续返回旧值的秒数
+        :param beta: 提前刷新系数，越大越早刷新，0 为不提前刷新
+        :param lock_ttl: 跨进程锁的过期秒数
+        :param lock_wait: 未获得锁时最多等待秒数
+        :param lock_interval: 未获得锁时检查结果的间隔秒数
+        """
+        if ttl is None:
+            ttl = self.cache.ttl
+        key_name = self.key_name(key)
+        entry = self._get(key_name)
+        if self.is_async:
+            entry = yield entry
+        if isinstance(entry, dict) and 'expires_at' in entry:
+            expires_at = entry['expires_at']
+            now = time.time()
+            if now - entry['delta'] * beta * math.log(1.0 - self.random_func()) < expires_at:
+                raise gen.Return(entry['value'])
+            if now < expires_at + stale_ttl:
+                future = self._compute(key_name, producer, ttl, stale_ttl, lock_ttl, 0, lock_interval)
+                future.add_done_callback(_log_refresh_error)
+                raise gen.Return(entry['value'])
+        if lock_wait is None:
+            lock_wait = lock_ttl
+        value = yield self._compute(key_name, producer, ttl, stale_ttl, lock_ttl, lock_wait, lock_interval)
+        if value is _NOT_COMPUTED:
+            # 等待的是未获得锁的后台刷新，按本次的 lock_wait 重新计算或等待
+            value = yield self._compute(key_name, producer, ttl, stale_ttl, lock_ttl, lock_wait, lock_interval)
+        raise gen.Return(None if value is _NOT_COMPUTED else value)
+
+    def _compute(self, key_name, producer, ttl, stale_ttl, lock_ttl, lock_wait, lock_interval):
+        future = _computing.get(key_name)
+        if future is None:
+            future = self._do_compute(key_name, producer, ttl, stale_ttl, lock_ttl, lock_wait, lock_interval)
+            if not future.done():
+                _computing[key_name] = future
+                future.add_done_callback(lambda f: _computing.pop(key_name, None))
+        return future
+
+    @gen.coroutine
+    def _do_compute(self, key_name, producer, ttl, stale_ttl, lock_ttl, lock_wait, lock_interval):
+        storage = self.cache.storage
+        lock_key = None
+        if lock_ttl is not None:
+            locked = storage.add(key_name + ':lock', 1, lock_ttl)
+            if self.is_async:
+                locked = yield locked
+            if locked:
+                lock_key = key_name + ':lock'
+            elif not lock_wait:
+                # 后台刷新时其他进程已在计算
+                raise gen.Return(_NOT_COMPUTED)
+            else:
+                deadline = time.time() + lock_wait
+                while time.time() < deadline:
+                    yield gen.sleep(lock_interval)
+                    entry = storage.get(key_name)
+                    if self.is_async:
+                        entry = yield entry
+                    if isinstance(entry, dict) and 'expires_at' in entry and entry['expires_at'] > time.time():
+                        raise gen.Return(entry['value'])
+        try:
+            start = time.time()
+            value = producer()
+            if _is_awaitable(value):
+                value = yield value
+            now = time.time()
+            if value is not None:
+                entry = {'value': value, 'expires_at': now + ttl, 'delta': now - start}
+                ret = self._set(key_name, entry, ttl + stale_ttl)
+                if self.is_async:
+                    yield ret
+        finally:
+            if lock_key is not None:
+                ret = storage.delete(lock_key)
+                if self.is_async:
+                    yield ret
+        raise gen.Return(value)
+
+
+# 缓存 None 结果时实际写入的值
+CACHED_NONE = '__tornadoapi_cached_none__'
+
+
+def _md5(value):
+    return hashlib.md5(to_binary(value)).hexdigest()
+
+
+def _key_part(value):
+    """
+    转换为 key 的一部分，不同类型、不同值的结果不同
+
+    不含 ':'、'=' 且不以 '#' 开头的字符串原样使用，其他值以 '#' 加类型标记开头
+    """
+    if isinstance(value, six.string_types):
+        if value.startswith('#') or ':' in value or '=' in value:
+            return '#s' + _md5(value)
+        return value
+    if value is None:
+        return '#none'
+    if isinstance(value, bool):
+        return '#true' if value else '#false'
+    if isinstance(value, six.integer_types):
+        return '#i%d' % value
+    if isinstance(value, float):
+        return '#d%r' % value
+    return '#h' + _md5(json_dumps(value, sort_keys=True))
+
+
+def _is_coroutine_function(func):
+    return gen.is_coroutine_function(func) or (
+        hasattr(inspect, 'iscoroutinefunction') and inspect.iscoroutinefunction(func)
+    )
+
+
+def _is_method(func):
+    if hasattr(inspect, 'getfullargspec'):
+        args = inspect.getfullargspec(func).args
+    else:
+        args = inspect.getargspec(func).args
+    return bool(args) and args[0] in ('self', 'cls')
+
+
+def _make_key_func(skip):
+
+    def make_key(*args, **kwargs):
+        parts = [_key_part(arg) for arg in args[skip:]]
+        parts.extend('%s=%s' % (k, _key_part(kwargs[k])) for k in sorted(kwargs))
+        return parts or None
+    return make_key
+
+
+def cached(cache_item, key=None, ttl=None, negative_ttl=None):
+    """
+    缓存函数返回值，函数为 coroutine 或 storage 为 AsyncBaseStorage 时返回 Future
+
+    ::
+
+        @cached(cache.user_info, ttl=60)
+        def get_user_info(user_id):
+            ...
+
+        get_user_info.invalidate(user_id)
+
+    :param cache_item: CacheItem，key 通过 cache_item.key_name 生成
+    :param key: 根据调用参数生成 key 的函数，默认使用全部参数（方法忽略 self/cls，invalidate 时不需要传入）
+    :param ttl: 缓存时间，默认为 cache.ttl
+    :param negative_ttl: 返回 None 时的缓存时间，None 为不缓存 None
+    """
+    def decorator(func):
+        skip_self = key is None and _is_method(func)
+        make_key = key or _make_key_func(1 if skip_self else 0)
+        is_async = _is_coroutine_function(func) or cache_item.is_async
+
+        def load(value):
+            if isinstance(value, six.string_types) and value == CACHED_NONE:
+                return None
+            return value
+
+        def store(k, value):
+            if value is not None:
+                return cache_item.set(k, value, ttl)
+            if negative_ttl is not None:
+                return cache_item.set(k, CACHED_NONE, negative_ttl)
+
+        @gen.coroutine
+        def async_wrapper(k, args, kwargs):
+            value = cache_item.get(k)
+            if cache_item.is_async:
+                value = yield value
+            if value is not None:
+                raise gen.Return(load(value))
+            value = func(*args, **kwargs)
+            if _is_awaitable(value):
+                value = yield value
+            ret = store(k, value)
+            if cache_item.is_async and ret is not None:
+                yield ret
+            raise gen.Return(value)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            k = make_key(*args, **kwargs)
+            if is_async:
+                return async_wrapper(k, args, kwargs)
+            value = cache_item.get(k)
+            if value is not None:
+                return load(value)
+            value = func(*args, **kwargs)
+            store(k, value)
+            return value
+
+        def invalidate(*args, **kwargs):
+            if skip_self:
+                args = (None, ) + args
+            return cache_item.delete(make_key(*args, **kwargs))
+
+        wrapper.invalidate = invalidate
+        wrapper.cache_key = make_key
+        return wrapper
+    return decorator
 
 
 class BaseCache(object):
@@ -55,7 +372,7 @@ class BaseCache(object):
         return self
 
     def __init__(self, storage, prefix=None):
-        assert isinstance(storage, BaseStorage)
+        assert isinstance(storage, (BaseStorage, AsyncBaseStorage))
         self.storage = storage
         if prefix is not None:
             self.prefix = prefix
@@ -64,6 +381,17 @@ class BaseCache(object):
         assert self.prefix is not None
         self.ttl = self._TTL
 
+    @property
+    def is_async(self):
+        return is_async_storage(self.storage)
+
+    def get_stats(self):
+        """
+        返回该 prefix 下全部 CacheItem 的合计统计，items 中为各 CacheItem 的统计，
+        未开启 settings.CACHE_STATS 或没有数据时返回 None
+        """
+        return stats.get_cache_stats(self.prefix).get(self.prefix)
+
 
 class SampleCache(BaseCache):
     _PREFIX = 'sample'
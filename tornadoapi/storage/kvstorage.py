@@ -1,47 +1,198 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
-import json
+from tornado import gen
 
-from tornadoapi.core import to_text
+from tornadoapi.core import to_binary
 
-from tornadoapi.storage import BaseStorage
+from tornadoapi.storage import AsyncBaseStorage, BaseStorage, iter_chunks
+from tornadoapi.storage.serializers import JSONSerializer
 
 
-class KvStorage(BaseStorage):
+class KvStorageMixin(object):
+    """
+    :param kvdb: kv 客户端，需要 get/set/delete 方法
+    :param prefix: key 前缀
+    :param chunk_size: mget/mset/mdelete 每批数量
+    :param serializer: tornadoapi.storage.serializers 中的序列化方式，默认为 JSONSerializer
+    """
 
-    def __init__(self, kvdb, prefix='cache'):
+    def __init__(self, kvdb, prefix='cache', chunk_size=1000, serializer=None):
         for method_name in ('get', 'set', 'delete'):
             assert hasattr(kvdb, method_name)
         self.kvdb = kvdb
         self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.serializer = serializer if serializer is not None else JSONSerializer()
 
     def key_name(self, key):
         return '{0}:{1}'.format(self.prefix, key)
 
+
+class KvStorage(KvStorageMixin, BaseStorage):
+    """
+    同步 kv 存储，如 redis.Redis、pymemcache.Client
+
+    mset/mdelete 优先使用客户端的 pipeline、set_many、delete_many 等批量命令，大批量数据按 chunk_size 分批
+    """
+
     def mget(self, keys=()):
         if not keys:
             return ()
         if not hasattr(self.kvdb, 'mget'):
             return super(KvStorage, self).mget(keys)
-        key_names = [self.key_name(key) for key in keys]
-        ret = self.kvdb.mget(key_names)
-        return [json.loads(to_text(value)) if value is not None else None for value in ret]
+        ret = []
+        for chunk in iter_chunks([self.key_name(key) for key in keys], self.chunk_size):
+            ret.extend(self.kvdb.mget(chunk))
+        return [self.serializer.loads(value) if value is not None else None for value in ret]
+
+    def mset(self, mapping, ttl=None):
+        items = [
+            (self.key_name(key), self.serializer.dumps(value)) for key, value in mapping.items() if value is not None
+        ]
+        kvdb = self.kvdb
+        for chunk in iter_chunks(items, self.chunk_size):
+            if hasattr(kvdb, 'pipeline'):
+                pipe = kvdb.pipeline(transaction=False)
+                for key, value in chunk:
+                    pipe.set(key, value, ttl)
+                pipe.execute()
+            elif hasattr(kvdb, 'set_many'):
+                if ttl is None:
+                    kvdb.set_many(dict(chunk))
+                else:
+                    kvdb.set_many(dict(chunk), ttl)
+            else:
+                for key, value in chunk:
+                    kvdb.set(key, value, ttl)
+
+    def mdelete(self, keys=()):
+        kvdb = self.kvdb
+        for chunk in iter_chunks([self.key_name(key) for key in keys], self.chunk_size):
+            if hasattr(kvdb, 'delete_many'):
+                kvdb.delete_many(chunk)
+            elif hasattr(kvdb, 'pipeline'):
+                # redis DEL 支持多个 key
+                kvdb.delete(*chunk)
+            else:
+                for key in chunk:
+                    kvdb.delete(key)
 
     def get(self, key, default=None):
         key = self.key_name(key)
         value = self.kvdb.get(key)
         if value is None:
             return default
-        return json.loads(to_text(value))
+        return self.serializer.loads(value)
 
     def set(self, key, value, ttl=None):
         if value is None:
             return
         key = self.key_name(key)
-        value = json.dumps(value)
+        value = self.serializer.dumps(value)
         self.kvdb.set(key, value, ttl)
 
     def delete(self, key):
         key = self.key_name(key)
         self.kvdb.delete(key)
+
+    def add(self, key, value, ttl=None):
+        if value is None:
+            return False
+        kvdb = self.kvdb
+        if hasattr(kvdb, 'add'):
+            # memcache，需要等待返回结果
+            return bool(kvdb.add(self.key_name(key), self.serializer.dumps(value), ttl or 0, False))
+        if hasattr(kvdb, 'pipeline'):
+            # redis SET NX
+            return bool(kvdb.set(self.key_name(key), self.serializer.dumps(value), ex=ttl, nx=True))
+        return super(KvStorage, self).add(key, value, ttl)
+
+
+class AsyncKvStorage(KvStorageMixin, AsyncBaseStorage):
+    """
+    使用异步客户端的 KvStorage，kvdb 的 get/set/delete 返回 awaitable 或 Future，
+    如 redis.asyncio.Redis、aiomcache.Client，key 与 value 以 bytes 传入
+    """
+
+    def key_name(self, key):
+        return to_binary(super(AsyncKvStorage, self).key_name(key))
+
+    @gen.coroutine
+    def mget(self, keys=()):
+        if not keys:
+            raise gen.Return([])
+        ret = []
+        for chunk in iter_chunks([self.key_name(key) for key in keys], self.chunk_size):
+            if hasattr(self.kvdb, 'mget'):
+                values = yield self.kvdb.mget(chunk)
+            elif hasattr(self.kvdb, 'multi_get'):
+                values = yield self.kvdb.multi_get(*chunk)
+            else:
+                values = yield [self.kvdb.get(key) for key in chunk]
+            ret.extend(values)
+        raise gen.Return([self.serializer.loads(value) if value is not None else None for value in ret])
+
+    @gen.coroutine
+    def get(self, key, default=None):
+        value = yield self.kvdb.get(self.key_name(key))
+        if value is None:
+            raise gen.Return(default)
+        raise gen.Return(self.serializer.loads(value))
+
+    @gen.coroutine
+    def set(self, key, value, ttl=None):
+        if value is None:
+            return
+        key = self.key_name(key)
+        value = self.serializer.dumps(value)
+        if ttl is None:
+            yield self.kvdb.set(key, value)
+        else:
+            yield self.kvdb.set(key, value, ttl)
+
+    @gen.coroutine
+    def delete(self, key):
+        yield self.kvdb.delete(self.key_name(key))
+
+    @gen.coroutine
+    def add(self, key, value, ttl=None):
+        if value is None:
+            raise gen.Return(False)
+        kvdb = self.kvdb
+        if hasattr(kvdb, 'add'):
+            ret = yield kvdb.add(self.key_name(key), self.serializer.dumps(value), ttl or 0)
+        elif hasattr(kvdb, 'pipeline'):
+            ret = yield kvdb.set(self.key_name(key), self.serializer.dumps(value), ex=ttl, nx=True)
+        else:
+            ret = yield super(AsyncKvStorage, self).add(key, value, ttl)
+        raise gen.Return(bool(ret))
+
+    @gen.coroutine
+    def mset(self, mapping, ttl=None):
+        items = [
+            (self.key_name(key), self.serializer.dumps(value)) for key, value in mapping.items() if value is not None
+        ]
+        kvdb = self.kvdb
+        for chunk in iter_chunks(items, self.chunk_size):
+            if hasattr(kvdb, 'pipeline'):
+                pipe = kvdb.pipeline(transaction=False)
+                for key, value in chunk:
+                    if ttl is None:
+                        pipe.set(key, value)
+                    else:
+                        pipe.set(key, value, ttl)
+                yield pipe.execute()
+            elif ttl is None:
+                yield [kvdb.set(key, value) for key, value in chunk]
+            else:
+                yield [kvdb.set(key, value, ttl) for key, value in chunk]
+
+    @gen.coroutine
+    def mdelete(self, keys=()):
+        kvdb = self.kvdb
+        for chunk in iter_chunks([self.key_name(key) for key in keys], self.chunk_size):
+            if hasattr(kvdb, 'pipeline'):
+                yield kvdb.delete(*chunk)
+            else:
+                yield [kvdb.delete(key) for key in chunk]
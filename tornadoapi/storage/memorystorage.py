@@ -2,33 +2,185 @@
 from __future__ import absolute_import, unicode_literals
 
 import time
+from collections import OrderedDict
 
-from tornadoapi.storage import BaseStorage
+from tornado.ioloop import PeriodicCallback
+
+from tornadoapi.storage import BaseStorage, estimate_size, stats
 
 
 class MemoryStorage(BaseStorage):
+    """
+    进程内存储
+
+    超过 max_entries 或 max_bytes 时按最近最少使用淘汰，过期数据在访问时清除，
+    调用 start_sweep 后由 IOLoop 定时清除，见 sweep
+
+    :param max_entries: 最多保存数量，None 为不限制
+    :param max_bytes: 最多占用字节数，按 size_func 估算，None 为不限制
+    :param sweep_interval: 定时清理过期数据间隔秒数
+    :param sweep_batch: 定时清理每批检查的数量
+    :param size_func: 估算数据字节数的函数
+    """
 
-    def __init__(self):
-        self._data = {}
+    def __init__(self, max_entries=None, max_bytes=None, sweep_interval=60, sweep_batch=1000,
+                 size_func=estimate_size):
+        self._data = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self.size_func = size_func
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._bounded = max_entries is not None or max_bytes is not None
+        self._sweep_callback = None
+        # sweep 检查的 key 快照及下次开始的位置，检查完后重新生成
+        self._sweep_keys = []
+        self._sweep_pos = 0
+
+    def __len__(self):
+        return len(self._data)
 
     def get(self, key, default=None):
         ret = self._data.get(key, None)
-        if ret is None or len(ret) != 2:
+        if ret is None:
+            self.misses += 1
+            return default
+        value, expires_at, size = ret
+        if expires_at is not None and expires_at <= time.time():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
             return default
-        else:
-            value = ret[0]
-            expires_at = ret[1]
-            if expires_at is None or expires_at > time.time():
-                return value
-            else:
-                return default
+        if self._bounded:
+            # 移到末尾，淘汰时从头部开始
+            del self._data[key]
+            self._data[key] = ret
+        self.hits += 1
+        return value
 
     def set(self, key, value, ttl=None):
         if value is None:
             return
         if ttl is not None:
             ttl = int(time.time()) + ttl
-        self._data[key] = (value, ttl)
+        self._set(key, value, ttl)
+        if self._bounded:
+            self._evict()
 
     def delete(self, key):
-        self._data.pop(key, None)
+        self._remove(key)
+
+    def add(self, key, value, ttl=None):
+        ret = self._data.get(key)
+        if value is None or (ret is not None and (ret[1] is None or ret[1] > time.time())):
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def mset(self, mapping, ttl=None):
+        expires_at = int(time.time()) + ttl if ttl is not None else None
+        for key, value in mapping.items():
+            if value is not None:
+                self._set(key, value, expires_at)
+        if self._bounded:
+            self._evict()
+
+    def mdelete(self, keys=()):
+        for key in keys:
+            self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self.used_bytes = 0
+        self._sweep_keys = []
+        self._sweep_pos = 0
+
+    def _set(self, key, value, expires_at):
+        size = self.size_func(value) if self.max_bytes is not None else 0
+        self._remove(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # 单个数据超过上限时不保存，避免淘汰全部数据
+            return
+        self._data[key] = (value, expires_at, size)
+        self.used_bytes += size
+
+    def _remove(self, key):
+        ret = self._data.pop(key, None)
+        if ret is not None:
+            self.used_bytes -= ret[2]
+
+    def _evict(self):
+        data = self._data
+        while data and (
+            (self.max_entries is not None and len(data) > self.max_entries) or
+            (self.max_bytes is not None and self.used_bytes > self.max_bytes)
+        ):
+            key, ret = data.popitem(last=False)
+            self.used_bytes -= ret[2]
+            self.evictions += 1
+            if stats.is_enabled():
+                stats.record_eviction(key)
+
+    def sweep(self, batch=None):
+        """
+        清除过期数据，返回清除数量
+
+        按 key 的快照每次检查 batch 个 key，下次调用从上次结束的位置继续，快照检查完后重新生成，
+        一批中超过 1/4 已过期时继续检查下一批，每次调用最多检查到快照末尾。
+        不改变 key 的顺序，快照生成后写入的 key 在下一轮检查
+        """
+        if batch is None:
+            batch = self.sweep_batch
+        data = self._data
+        if self._sweep_pos >= len(self._sweep_keys):
+            self._sweep_keys = list(data)
+            self._sweep_pos = 0
+        keys = self._sweep_keys
+        now = time.time()
+        removed = 0
+        while self._sweep_pos < len(keys):
+            start = self._sweep_pos
+            self._sweep_pos = min(start + batch, len(keys))
+            expired = 0
+            for key in keys[start:self._sweep_pos]:
+                ret = data.get(key)
+                if ret is not None and ret[1] is not None and ret[1] <= now:
+                    self._remove(key)
+                    expired += 1
+            removed += expired
+            if expired * 4 <= self._sweep_pos - start:
+                break
+        if self._sweep_pos >= len(keys):
+            # 释放快照中已删除的 key
+            self._sweep_keys = []
+            self._sweep_pos = 0
+        self.expirations += removed
+        return removed
+
+    def start_sweep(self):
+        """
+        在当前 IOLoop 中每 sweep_interval 秒清理一批过期数据，需要在 IOLoop 启动后调用
+        """
+        if self._sweep_callback is None:
+            self._sweep_callback = PeriodicCallback(self.sweep, self.sweep_interval * 1000)
+            self._sweep_callback.start()
+
+    def stop_sweep(self):
+        if self._sweep_callback is not None:
+            self._sweep_callback.stop()
+            self._sweep_callback = None
+
+    def get_stats(self):
+        return {
+            'entries': len(self._data),
+            'bytes': self.used_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
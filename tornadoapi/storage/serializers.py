@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import datetime
+import decimal
+import json
+import sys
+import uuid
+import zlib
+
+import six
+from six.moves import cPickle as pickle
+
+from tornadoapi.core import json_dumps, to_binary
+
+
+class BaseSerializer(object):
+    """
+    KvStorage 数据序列化，dumps 返回 bytes，loads 接收 bytes
+    """
+
+    def dumps(self, value):
+        raise NotImplementedError()
+
+    def loads(self, data):
+        raise NotImplementedError()
+
+
+class JSONSerializer(BaseSerializer):
+    """
+    json 序列化，时间日期、Decimal、UUID 使用项目的 JSONEncoder 转换为字符串
+    """
+
+    def dumps(self, value):
+        return to_binary(json_dumps(value))
+
+    def loads(self, data):
+        if isinstance(data, bytes) and six.PY3 and sys.version_info < (3, 6):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class MsgpackSerializer(BaseSerializer):
+    """
+    msgpack 序列化，保留 datetime、date、time、Decimal、UUID、tuple 类型，需安装 msgpack
+    """
+    EXT_DATETIME = 1
+    EXT_DATE = 2
+    EXT_TIME = 3
+    EXT_DECIMAL = 4
+    EXT_UUID = 5
+    EXT_TUPLE = 6
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def _default(self, obj):
+        ext_type = self.msgpack.ExtType
+        if isinstance(obj, tuple):
+            return ext_type(self.EXT_TUPLE, self.dumps(list(obj)))
+        if isinstance(obj, dict):
+            return dict(obj)
+        if isinstance(obj, list):
+            return list(obj)
+        if isinstance(obj, datetime.datetime):
+            return ext_type(self.EXT_DATETIME, self._dumps_with_offset(obj))
+        if isinstance(obj, datetime.date):
+            return ext_type(self.EXT_DATE, to_binary(obj.isoformat()))
+        if isinstance(obj, datetime.time):
+            return ext_type(self.EXT_TIME, self._dumps_with_offset(obj))
+        if isinstance(obj, decimal.Decimal):
+            return ext_type(self.EXT_DECIMAL, to_binary(str(obj)))
+        if isinstance(obj, uuid.UUID):
+            return ext_type(self.EXT_UUID, obj.bytes)
+        raise TypeError('Object of type %s is not msgpack serializable' % type(obj).__name__)
+
+    def _ext_hook(self, code, data):
+        if code == self.EXT_TUPLE:
+            return tuple(self.loads(data))
+        if code == self.EXT_DECIMAL:
+            return decimal.Decimal(data.decode('ascii'))
+        if code == self.EXT_UUID:
+            return uuid.UUID(bytes=data)
+        if code == self.EXT_DATE:
+            return datetime.datetime.strptime(data.decode('ascii'), '%Y-%m-%d').date()
+        if code == self.EXT_DATETIME:
+            value, tz = self._loads_with_offset(data, '%Y-%m-%dT%H:%M:%S.%f')
+            return value.replace(tzinfo=tz)
+        if code == self.EXT_TIME:
+            value, tz = self._loads_with_offset(data, '%H:%M:%S.%f')
+            return value.time().replace(tzinfo=tz)
+        return self.msgpack.ExtType(code, data)
+
+    def _dumps_with_offset(self, obj):
+        offset = obj.utcoffset()
+        offset = None if offset is None else offset.days * 1440 + offset.seconds // 60
+        return self.dumps([obj.replace(tzinfo=None).strftime(
+            '%Y-%m-%dT%H:%M:%S.%f' if isinstance(obj, datetime.datetime) else '%H:%M:%S.%f'
+        ), offset])
+
+    def _loads_with_offset(self, data, fmt):
+        value, offset = self.loads(data)
+        tz = None if offset is None else FixedOffset(offset)
+        return datetime.datetime.strptime(value, fmt), tz
+
+    def dumps(self, value):
+        return self.msgpack.packb(value, default=self._default, use_bin_type=True, strict_types=True)
+
+    def loads(self, data):
+        return self.msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False)
+
+
+class FixedOffset(datetime.tzinfo):
+    """
+    固定时差的时区，单位为分钟
+    """
+
+    def __init__(self, minutes):
+        self.minutes = minutes
+        self._offset = datetime.timedelta(minutes=minutes)
+
+    def __getinitargs__(self):
+        return (self.minutes, )
+
+    def utcoffset(self, dt):
+        return self._offset
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
+
+    def tzname(self, dt):
+        return None
+
+    def __repr__(self):
+        return 'FixedOffset(%d)' % self.minutes
+
+
+class PickleSerializer(BaseSerializer):
+    """
+    pickle 序列化，保留全部 Python 类型，只能用于可信的存储
+    """
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+
+    def dumps(self, value):
+        return pickle.dumps(value, self.protocol)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+
+class CompressedSerializer(BaseSerializer):
+    """
+    超过 min_length 字节的数据使用 zlib 压缩，数据第一个字节标记是否压缩
+
+    没有标记的数据按未压缩处理，可以读取之前使用 JSONSerializer 写入的数据
+
+    :param serializer: 实际序列化方式，默认为 JSONSerializer
+    :param min_length: 超过该字节数时压缩
+    :param level: zlib 压缩等级
+    """
+    HEADER_RAW = b'\x00'
+    HEADER_ZLIB = b'\x01'
+
+    def __init__(self, serializer=None, min_length=1024, level=6):
+        self.serializer = serializer if serializer is not None else JSONSerializer()
+        self.min_length = min_length
+        self.level = level
+
+    def dumps(self, value):
+        data = self.serializer.dumps(value)
+        if len(data) > self.min_length:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return self.HEADER_ZLIB + compressed
+        return self.HEADER_RAW + data
+
+    def loads(self, data):
+        data = to_binary(data)
+        header = data[:1]
+        if header == self.HEADER_ZLIB:
+            return self.serializer.loads(zlib.decompress(data[1:]))
+        if header == self.HEADER_RAW:
+            return self.serializer.loads(data[1:])
+        return self.serializer.loads(data)
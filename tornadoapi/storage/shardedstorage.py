@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import bisect
+import hashlib
+import struct
+
+from tornado import gen
+
+from tornadoapi.core import to_binary
+from tornadoapi.storage import AsyncBaseStorage, BaseStorage
+
+
+class HashRing(object):
+    """
+    一致性哈希环，每个节点在环上有 replicas 个虚拟节点，增加或删除一个节点时只有约 1/N 的 key 改变节点
+
+    节点按名称计算位置，多个进程中使用相同名称时 key 的分布一致
+
+    :param names: 节点名称
+    :param replicas: 每个节点的虚拟节点数量
+    """
+
+    def __init__(self, names=(), replicas=160):
+        self.replicas = replicas
+        self._ring = {}
+        self._points = []
+        for name in names:
+            self.add_node(name)
+
+    @staticmethod
+    def hash(key):
+        return struct.unpack(str('>I'), hashlib.md5(to_binary(key)).digest()[:4])[0]
+
+    def add_node(self, name):
+        for i in range(self.replicas):
+            self._ring[self.hash('%s#%d' % (name, i))] = name
+        self._points = sorted(self._ring)
+
+    def remove_node(self, name):
+        for i in range(self.replicas):
+            point = self.hash('%s#%d' % (name, i))
+            if self._ring.get(point) == name:
+                del self._ring[point]
+        self._points = sorted(self._ring)
+
+    def get_node(self, key):
+        """
+        返回 key 所在节点名称，没有节点时返回 None
+        """
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, self.hash(key)) % len(self._points)
+        return self._ring[self._points[index]]
+
+
+class ShardedStorageMixin(object):
+    """
+    :param nodes: {节点名称: 存储}，节点名称用于计算 key 的分布，调整节点时保持其他节点名称不变
+    :param replicas: 每个节点的虚拟节点数量
+    """
+    storage_class = BaseStorage
+
+    def __init__(self, nodes, replicas=160):
+        self.nodes = {}
+        self.ring = HashRing(replicas=replicas)
+        for name, storage in nodes.items():
+            self.add_node(name, storage)
+
+    def add_node(self, name, storage):
+        assert isinstance(storage, self.storage_class)
+        assert name not in self.nodes
+        self.nodes[name] = storage
+        self.ring.add_node(name)
+
+    def remove_node(self, name):
+        """
+        删除节点并返回该节点的存储，其中的数据不再读取
+        """
+        self.ring.remove_node(name)
+        return self.nodes.pop(name)
+
+    def get_node(self, key):
+        return self.nodes[self.get_node_name(key)]
+
+    def get_node_name(self, key):
+        name = self.ring.get_node(key)
+        if name is None:
+            raise LookupError('ShardedStorage 没有存储节点')
+        return name
+
+    def group_keys(self, keys):
+        """
+        按节点分组，返回 {节点名称: [(位置, key), ...]}
+        """
+        groups = {}
+        for i, key in enumerate(keys):
+            groups.setdefault(self.get_node_name(key), []).append((i, key))
+        return groups
+
+    def group_mapping(self, mapping):
+        groups = {}
+        for key, value in mapping.items():
+            groups.setdefault(self.get_node_name(key), {})[key] = value
+        return groups
+
+
+class ShardedStorage(ShardedStorageMixin, BaseStorage):
+    """
+    按一致性哈希将 key 分布到多个存储，如多个 KvStorage
+
+    mget/mset/mdelete 按节点分组，涉及多个节点时在 executor 中并发执行
+
+    :param executor: concurrent.futures.Executor，默认为每个节点一个线程的 ThreadPoolExecutor，
+                     节点数量增加时重新创建，Python 2 需安装 futures
+    """
+
+    def __init__(self, nodes, replicas=160, executor=None):
+        self._executor = executor
+        self._own_executor = executor is None
+        self._executor_workers = 0
+        super(ShardedStorage, self).__init__(nodes, replicas)
+
+    @property
+    def executor(self):
+        if self._own_executor and self._executor_workers < len(self.nodes):
+            from concurrent.futures import ThreadPoolExecutor
+            if self._executor is not None:
+                # 正在执行的任务完成后旧线程退出
+                self._executor.shutdown(wait=False)
+            self._executor_workers = len(self.nodes)
+            self._executor = ThreadPoolExecutor(self._executor_workers)
+        return self._executor
+
+    def close(self):
+        """
+        关闭自动创建的 executor
+        """
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._executor_workers = 0
+
+    def _run(self, calls):
+        """
+        执行 [(method, args), ...]，多于一个时并发执行，按顺序返回结果
+        """
+        if len(calls) == 1:
+            method, args = calls[0]
+            return [method(*args)]
+        futures = [self.executor.submit(method, *args) for method, args in calls]
+        return [future.result() for future in futures]
+
+    def get(self, key, default=None):
+        return self.get_node(key).get(key, default)
+
+    def set(self, key, value, ttl=None):
+        return self.get_node(key).set(key, value, ttl)
+
+    def delete(self, key):
+        return self.get_node(key).delete(key)
+
+    def add(self, key, value, ttl=None):
+        return self.get_node(key).add(key, value, ttl)
+
+    def mget(self, keys=()):
+        keys = list(keys)
+        ret = [None] * len(keys)
+        groups = list(self.group_keys(keys).items())
+        if not groups:
+            return ret
+        results = self._run([(self.nodes[name].mget, ([key for i, key in items], )) for name, items in groups])
+        for (name, items), values in zip(groups, results):
+            for (i, key), value in zip(items, values):
+                ret[i] = value
+        return ret
+
+    def mset(self, mapping, ttl=None):
+        groups = self.group_mapping(mapping)
+        if groups:
+            self._run([(self.nodes[name].mset, (items, ttl)) for name, items in groups.items()])
+
+    def mdelete(self, keys=()):
+        groups = self.group_keys(keys)
+        if groups:
+            self._run([(self.nodes[name].mdelete, ([key for i, key in items], )) for name, items in groups.items()])
+
+
+class AsyncShardedStorage(ShardedStorageMixin, AsyncBaseStorage):
+    """
+    ShardedStorage 的异步版本，节点为 AsyncBaseStorage，多个节点的 mget/mset/mdelete 同时执行
+    """
+    storage_class = AsyncBaseStorage
+
+    def get(self, key, default=None):
+        return self.get_node(key).get(key, default)
+
+    def set(self, key, value, ttl=None):
+        return self.get_node(key).set(key, value, ttl)
+
+    def delete(self, key):
+        return self.get_node(key).delete(key)
+
+    def add(self, key, value, ttl=None):
+        return self.get_node(key).add(key, value, ttl)
+
+    @gen.coroutine
+    def mget(self, keys=()):
+        keys = list(keys)
+        ret = [None] * len(keys)
+        groups = list(self.group_keys(keys).items())
+        results = yield [self.nodes[name].mget([key for i, key in items]) for name, items in groups]
+        for (name, items), values in zip(groups, results):
+            for (i, key), value in zip(items, values):
+                ret[i] = value
+        raise gen.Return(ret)
+
+    @gen.coroutine
+    def mset(self, mapping, ttl=None):
+        yield [self.nodes[name].mset(items, ttl) for name, items in self.group_mapping(mapping).items()]
+
+    @gen.coroutine
+    def mdelete(self, keys=()):
+        yield [
+            self.nodes[name].mdelete([key for i, key in items]) for name, items in self.group_keys(keys).items()
+        ]
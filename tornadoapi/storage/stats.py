@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import bisect
+import os
+
+from tornadoapi.conf import ENVIRONMENT_VARIABLE, connect_setting_changed
+from tornadoapi.core.functional import empty
+from tornadoapi.storage import estimate_size
+
+# 存储耗时直方图的分桶上限（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram(object):
+    """
+    耗时直方图，counts 最后一项为超过最大分桶的数量
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.sum += other.sum
+
+    def to_dict(self):
+        """
+        buckets 为累计数量 [[上限, 数量], ...]，最后一项上限为 '+Inf'
+        """
+        buckets = []
+        total = 0
+        for le, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            buckets.append([le, total])
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+
+class CacheStats(object):
+    """
+    缓存统计，数据大小按 estimate_size 估算
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.deletes = 0
+        self.evictions = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.latency = {}
+
+    def observe(self, op, seconds):
+        histogram = self.latency.get(op)
+        if histogram is None:
+            histogram = self.latency[op] = Histogram()
+        histogram.observe(seconds)
+
+    def record_get(self, values):
+        for value in values:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.bytes_read += estimate_size(value)
+
+    def record_set(self, values):
+        for value in values:
+            if value is not None:
+                self.sets += 1
+                self.bytes_written += estimate_size(value)
+
+    def record_delete(self, count):
+        self.deletes += count
+
+    def merge(self, other):
+        self.hits += other.hits
+        self.misses += other.misses
+        self.sets += other.sets
+        self.deletes += other.deletes
+        self.evictions += other.evictions
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+        for op, histogram in other.latency.items():
+            if op not in self.latency:
+                self.latency[op] = Histogram(histogram.buckets)
+            self.latency[op].merge(histogram)
+
+    def to_dict(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / total if total else None,
+            'sets': self.sets,
+            'deletes': self.deletes,
+            'evictions': self.evictions,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'latency': dict((op, histogram.to_dict()) for op, histogram in self.latency.items()),
+        }
+
+
+# {prefix: {name: CacheStats}}
+_stats = {}
+_enabled = empty
+
+
+def is_enabled():
+    """
+    是否开启缓存统计，对应 settings.CACHE_STATS，settings 未配置时不开启
+    """
+    global _enabled
+    if _enabled is empty:
+        from tornadoapi.conf import settings
+        configured = settings.configured or bool(os.environ.get(ENVIRONMENT_VARIABLE))
+        _enabled = configured and bool(settings.CACHE_STATS)
+    return _enabled
+
+
+def get_item_stats(prefix, name):
+    """
+    返回 BaseCache prefix 下 CacheItem name 的 CacheStats
+    """
+    items = _stats.get(prefix)
+    if items is None:
+        items = _stats[prefix] = {}
+    item_stats = items.get(name)
+    if item_stats is None:
+        item_stats = items[name] = CacheStats()
+    return item_stats
+
+
+def record_eviction(key):
+    """
+    记录存储淘汰的 key，按已统计的 prefix 及 key 中的 CacheItem 名称归类
+    """
+    for prefix in _stats:
+        if key.startswith(prefix + ':'):
+            name = key[len(prefix) + 1:].split(':', 1)[0]
+            get_item_stats(prefix, name).evictions += 1
+            return
+
+
+def get_cache_stats(prefix=None):
+    """
+    返回 {prefix: 统计}，每个 prefix 的统计为其下全部 CacheItem 的合计，items 中为各 CacheItem 的统计
+
+    :param prefix: 只返回该 prefix 的统计
+    """
+    ret = {}
+    for cache_prefix, items in list(_stats.items()):
+        if prefix is not None and cache_prefix != prefix:
+            continue
+        total = CacheStats()
+        for item_stats in items.values():
+            total.merge(item_stats)
+        ret[cache_prefix] = total.to_dict()
+        ret[cache_prefix]['items'] = dict((name, item_stats.to_dict()) for name, item_stats in items.items())
+    return ret
+
+
+def reset_cache_stats():
+    _stats.clear()
+
+
+@connect_setting_changed
+def _reset_enabled(name):
+    global _enabled
+    if name is None or name == 'CACHE_STATS':
+        _enabled = empty
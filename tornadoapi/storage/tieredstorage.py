@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import errno
+import json
+import os
+import socket
+import time
+import uuid
+import weakref
+
+from tornado.ioloop import IOLoop
+
+from tornadoapi.core import logger, to_binary, to_text
+from tornadoapi.core.functional import empty
+from tornadoapi.storage import BaseStorage, iter_chunks
+from tornadoapi.storage.memorystorage import MemoryStorage
+
+
+class BaseInvalidator(object):
+    """
+    本地缓存失效通知，publish 的 key 会通知到其他进程或实例订阅的回调 callback(keys)，
+    keys 为 None 时需要清空本地缓存
+    """
+
+    def __init__(self):
+        self._callbacks = []
+
+    def subscribe(self, callback):
+        self._callbacks.append(callback)
+
+    def publish(self, keys):
+        raise NotImplementedError()
+
+    def notify(self, keys):
+        for callback in self._callbacks:
+            callback(keys)
+
+
+class LocalInvalidator(BaseInvalidator):
+    """
+    进程内通知，同一 channel 的其他实例会收到通知，用于测试或同一进程中的多个 TieredStorage
+    """
+    # {channel: WeakSet}，未 close 的实例被回收后自动移除
+    _channels = {}
+
+    def __init__(self, channel='default'):
+        super(LocalInvalidator, self).__init__()
+        self.channel = channel
+        invalidators = self._channels.get(channel)
+        if invalidators is None:
+            invalidators = self._channels[channel] = weakref.WeakSet()
+        invalidators.add(self)
+
+    def publish(self, keys):
+        if not keys:
+            return
+        for invalidator in list(self._channels.get(self.channel, ())):
+            if invalidator is not self:
+                invalidator.notify(list(keys))
+
+    def close(self):
+        invalidators = self._channels.get(self.channel)
+        if invalidators is None:
+            return
+        invalidators.discard(self)
+        if not invalidators:
+            del self._channels[self.channel]
+
+
+class UnixSocketInvalidator(BaseInvalidator):
+    """
+    同一台机器上多个进程之间的通知，每个进程在 directory 中绑定一个 unix datagram socket，
+    publish 时发送给目录中其他 socket
+
+    需要在 fork 之后、IOLoop 中调用 start
+
+    消息超过 max_message_size 时拆分发送，单个 key 超过时通知其他进程清空本地缓存
+
+    :param directory: socket 文件目录，同一组进程使用相同目录
+    :param batch_size: 每个消息最多包含的 key 数量
+    :param peer_refresh_interval: 重新读取目录中 socket 列表的间隔秒数，新启动的进程在此时间后开始收到通知
+    :param max_message_size: 每个消息最大字节数
+    """
+
+    def __init__(self, directory, batch_size=100, peer_refresh_interval=5, max_message_size=60000):
+        super(UnixSocketInvalidator, self).__init__()
+        self.directory = directory
+        self.batch_size = batch_size
+        self.peer_refresh_interval = peer_refresh_interval
+        self.max_message_size = max_message_size
+        self.path = None
+        self._socket = None
+        self._io_loop = None
+        self._peers = None
+        self._peers_time = 0
+
+    def start(self):
+        if self._socket is not None:
+            return
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        self.path = os.path.join(self.directory, '%d-%s.sock' % (os.getpid(), uuid.uuid4().hex[:8]))
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(self.path)
+        self._socket = sock
+        self._io_loop = IOLoop.current()
+        self._io_loop.add_handler(sock.fileno(), self._handle_read, IOLoop.READ)
+
+    def close(self):
+        if self._socket is None:
+            return
+        self._io_loop.remove_handler(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+        self._peers = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def get_peers(self):
+        """
+        返回其他进程的 socket 路径，按 peer_refresh_interval 缓存
+        """
+        now = time.time()
+        if self._peers is None or now - self._peers_time >= self.peer_refresh_interval:
+            self._peers = [
+                os.path.join(self.directory, filename) for filename in os.listdir(self.directory)
+                if filename.endswith('.sock') and os.path.join(self.directory, filename) != self.path
+            ]
+            self._peers_time = now
+        return self._peers
+
+    def publish(self, keys):
+        if not keys or self._socket is None:
+            return
+        messages = []
+        for chunk in iter_chunks(keys, self.batch_size):
+            messages.extend(self._encode(chunk))
+        for path in list(self.get_peers()):
+            for data in messages:
+                if not self._send(data, path):
+                    break
+
+    def _encode(self, keys):
+        data = to_binary(json.dumps(keys))
+        if len(data) <= self.max_message_size:
+            return [data]
+        if len(keys) == 1:
+            # 无法拆分时通知清空本地缓存
+            return [to_binary(json.dumps(None))]
+        half = len(keys) // 2
+        return self._encode(keys[:half]) + self._encode(keys[half:])
+
+    def _send(self, data, path):
+        """
+        发送到 path，对方已退出时返回 False
+        """
+        try:
+            self._socket.sendto(data, path)
+        except socket.error as e:
+            if e.errno in (errno.ECONNREFUSED, errno.ENOENT):
+                # 已退出的进程
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+                self._peers = None
+                return False
+            elif e.errno == errno.EMSGSIZE:
+                logger.warning('Invalidation message of %d bytes is too large for %s', len(data), path)
+            elif e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS):
+                raise
+            # 对方缓冲区已满时丢弃，本地缓存依靠 local_ttl 过期
+        return True
+
+    def _handle_read(self, fd, events):
+        while self._socket is not None:
+            try:
+                data = self._socket.recv(self.max_message_size + 1)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+            try:
+                if len(data) > self.max_message_size:
+                    raise ValueError('truncated')
+                keys = json.loads(to_text(data))
+            except ValueError:
+                # 消息被截断或无法解析时清空本地缓存
+                logger.warning('Invalid invalidation message of %d bytes, clearing local cache', len(data))
+                keys = None
+            self.notify(keys)
+
+
+class TieredStorage(BaseStorage):
+    """
+    两级存储，本地存储在前，远程存储在后
+
+    读取时先读本地存储，未命中时读远程存储并写入本地存储；写入、删除同时作用于两级存储，
+    并通过 invalidator 通知其他进程清除本地缓存
+
+    :param remote: 远程存储，如 KvStorage
+    :param local: 本地存储，需支持 clear，默认为 MemoryStorage(max_entries=10000)
+    :param local_ttl: 本地存储秒数
+    :param invalidator: BaseInvalidator，None 时只依靠 local_ttl 过期
+    """
+
+    def __init__(self, remote, local=None, local_ttl=5, invalidator=None):
+        assert isinstance(remote, BaseStorage)
+        self.remote = remote
+        self.local = local if local is not None else MemoryStorage(max_entries=10000)
+        self.local_ttl = local_ttl
+        self.invalidator = invalidator
+        if invalidator is not None:
+            invalidator.subscribe(self.invalidate_local)
+
+    def get_local_ttl(self, ttl=None):
+        if ttl is None:
+            return self.local_ttl
+        if self.local_ttl is None:
+            return ttl
+        return min(ttl, self.local_ttl)
+
+    def invalidate_local(self, keys):
+        if keys is None:
+            self.local.clear()
+        else:
+            self.local.mdelete(keys)
+
+    def get(self, key, default=None):
+        value = self.local.get(key, empty)
+        if value is not empty:
+            return value
+        value = self.remote.get(key)
+        if value is None:
+            return default
+        self.local.set(key, value, self.local_ttl)
+        return value
+
+    def mget(self, keys=()):
+        keys = list(keys)
+        ret = self.local.mget(keys)
+        missing = [i for i, value in enumerate(ret) if value is None]
+        if missing:
+            values = self.remote.mget([keys[i] for i in missing])
+            found = {}
+            for i, value in zip(missing, values):
+                ret[i] = value
+                if value is not None:
+                    found[keys[i]] = value
+            if found:
+                self.local.mset(found, self.local_ttl)
+        return ret
+
+    def set(self, key, value, ttl=None):
+        self.remote.set(key, value, ttl)
+        if value is None:
+            return
+        self.local.set(key, value, self.get_local_ttl(ttl))
+        self._publish([key])
+
+    def delete(self, key):
+        self.remote.delete(key)
+        self.local.delete(key)
+        self._publish([key])
+
+    def add(self, key, value, ttl=None):
+        if not self.remote.add(key, value, ttl):
+            return False
+        self.local.set(key, value, self.get_local_ttl(ttl))
+        self._publish([key])
+        return True
+
+    def mset(self, mapping, ttl=None):
+        self.remote.mset(mapping, ttl)
+        self.local.mset(mapping, self.get_local_ttl(ttl))
+        self._publish([key for key, value in mapping.items() if value is not None])
+
+    def mdelete(self, keys=()):
+        keys = list(keys)
+        self.remote.mdelete(keys)
+        self.local.mdelete(keys)
+        self._publish(keys)
+
+    def _publish(self, keys):
+        if self.invalidator is not None:
+            self.invalidator.publish(keys)
@@ -21,8 +21,8 @@ class BaseValidator(object):
 
     def __call__(self, value):
         cleaned = self.clean(value)
-        params = {'limit_value': self.limit_value, 'show_value': cleaned, 'value': value}
         if self.compare(cleaned, self.limit_value):
+            params = {'limit_value': self.limit_value, 'show_value': cleaned, 'value': value}
             params.update(self.params)
             _validator_fail(self.code, self.message, params)
 
@@ -125,3 +125,33 @@ class DecimalValidator(object):
             self.max_digits == other.max_digits and
             self.decimal_places == other.decimal_places
         )
+
+
+def compile_validator(validator):
+    """
+    返回与 validator 等价的检查函数
+
+    常用的最大最小值、长度检查器直接内联比较，仅在校验失败时调用原检查器生成错误信息
+    """
+    cls = type(validator)
+    if cls not in (MaxValueValidator, MinValueValidator, MaxLengthValidator, MinLengthValidator):
+        return validator
+    limit_value = validator.limit_value
+
+    if cls is MaxValueValidator:
+        def check(value):
+            if value > limit_value:
+                validator(value)
+    elif cls is MinValueValidator:
+        def check(value):
+            if value < limit_value:
+                validator(value)
+    elif cls is MaxLengthValidator:
+        def check(value):
+            if len(value) > limit_value:
+                validator(value)
+    else:
+        def check(value):
+            if len(value) < limit_value:
+                validator(value)
+    return check